@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+#vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
+'''
+
+ Description:
+
+    Simple caches used to avoid repeated Jira API calls
+
+ Requirements:
+   Python 3.8+
+
+ Author: Chris Marrison
+
+ Date Last Updated: 20261017
+
+ Todo:
+
+ Copyright (c) 2026 Chris Marrison / Infoblox
+
+ Redistribution and use in source and binary forms,
+ with or without modification, are permitted provided
+ that the following conditions are met:
+
+ 1. Redistributions of source code must retain the above copyright
+ notice, this list of conditions and the following disclaimer.
+
+ 2. Redistributions in binary form must reproduce the above copyright
+ notice, this list of conditions and the following disclaimer in the
+ documentation and/or other materials provided with the distribution.
+
+ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+ FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+ INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+ BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+ LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+ CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+ LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.
+
+'''
+__version__ = '0.0.1'
+__author__ = 'Chris Marrison'
+__author_email__ = 'chris@infoblox.com'
+
+
+import logging
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+import collections
+
+_logger = logging.getLogger(__name__)
+
+# Bump when the layout of cached data changes
+CACHE_VERSION:int = 2
+DEFAULT_CACHE_DIR:str = os.path.join('~', '.cache', 'jira_automation')
+
+
+class DISK_CACHE():
+    '''
+    Versioned on-disk JSON cache, one file per (namespace, server, user)
+    as what Jira returns depends on the permissions of the user
+
+    Writes go to a temporary file that is atomically renamed into place,
+    so concurrent readers only ever see a complete file and concurrent
+    writers simply result in the last complete write winning.
+    '''
+
+    def __init__(self,
+                 namespace:str,
+                 cache_dir:str = DEFAULT_CACHE_DIR,
+                 ttl:int = 86400):
+        '''
+        Initial Values
+
+        Parameters:
+            namespace:str = Type of data cached, e.g. 'fields'
+            cache_dir:str = Directory used to store cache files
+            ttl:int = Time to live in seconds, 0 disables expiry
+        '''
+        self.namespace:str = namespace
+        self.cache_dir:str = os.path.abspath(os.path.expanduser(cache_dir))
+        self.ttl:int = ttl
+        self._lock = threading.Lock()
+
+        return
+
+
+    def filename(self, server:str, user:str = '') -> str:
+        '''
+        Cache filename for the specified server and user
+
+        Parameters:
+            server:str = Jira server URL
+            user:str = Jira user
+
+        Returns:
+            Full path to the cache file
+        '''
+        identity = f'{server.rstrip("/")}\n{user}'
+        digest = hashlib.sha1(identity.encode()).hexdigest()[:16]
+
+        return os.path.join(self.cache_dir, f'{self.namespace}-{digest}.json')
+
+
+    def get(self, server:str, user:str = ''):
+        '''
+        Retrieve cached data for server and user
+
+        Parameters:
+            server:str = Jira server URL
+            user:str = Jira user
+
+        Returns:
+            Cached data or None if missing, expired or invalid
+        '''
+        data = None
+        filename = self.filename(server, user)
+
+        try:
+            with open(filename) as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            _logger.debug(f'No {self.namespace} cache for {server}')
+            return None
+        except (OSError, ValueError) as err:
+            _logger.warning(f'Ignoring unreadable cache {filename}: {err}')
+            return None
+
+        if not isinstance(entry, dict):
+            _logger.warning(f'Ignoring malformed cache {filename}')
+        elif entry.get('version') != CACHE_VERSION:
+            _logger.debug(f'Cache version mismatch for {filename}')
+        elif entry.get('server') != server.rstrip('/'):
+            _logger.debug(f'Cache server mismatch for {filename}')
+        elif entry.get('user') != user:
+            _logger.debug(f'Cache user mismatch for {filename}')
+        elif self.ttl and time.time() - entry.get('timestamp', 0) > self.ttl:
+            _logger.debug(f'{self.namespace} cache for {server} expired')
+        else:
+            data = entry.get('data')
+            _logger.debug(f'Using cached {self.namespace} for {server}')
+
+        return data
+
+
+    def put(self, server:str, data, user:str = '') -> bool:
+        '''
+        Store data in cache for server and user
+
+        Parameters:
+            server:str = Jira server URL
+            data = JSON serialisable data
+            user:str = Jira user
+
+        Returns:
+            bool indicating whether the cache was written
+        '''
+        status:bool = False
+        filename = self.filename(server, user)
+        entry:dict = { 'version': CACHE_VERSION,
+                       'server': server.rstrip('/'),
+                       'user': user,
+                       'timestamp': time.time(),
+                       'data': data }
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmpfile = tempfile.mkstemp(dir=self.cache_dir,
+                                           prefix=f'.{self.namespace}-',
+                                           suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(entry, f)
+                os.replace(tmpfile, filename)
+                status = True
+                _logger.debug(f'Wrote {self.namespace} cache {filename}')
+            except:
+                os.unlink(tmpfile)
+                raise
+        except (OSError, TypeError, ValueError) as err:
+            _logger.warning(f'Failed to write cache {filename}: {err}')
+            status = False
+
+        return status
+
+
+    def invalidate(self, server:str, user:str = '') -> bool:
+        '''
+        Remove cached data for server and user
+
+        Parameters:
+            server:str = Jira server URL
+            user:str = Jira user
+
+        Returns:
+            bool indicating whether a cache file was removed
+        '''
+        status:bool = False
+
+        try:
+            os.remove(self.filename(server, user))
+            _logger.info(f'Invalidated {self.namespace} cache for {server}')
+            status = True
+        except FileNotFoundError:
+            status = False
+
+        return status
+
+
+    def get_entry(self, server:str, key:str, user:str = ''):
+        '''
+        Retrieve a single keyed entry for server and user, each entry
+        carries its own timestamp so the TTL applies per entry
+
+        Parameters:
+            server:str = Jira server URL
+            key:str = Entry key
+            user:str = Jira user
+
+        Returns:
+            Cached value or None if missing or expired
+        '''
+        value = None
+        entries = self.get(server, user)
+
+        if isinstance(entries, dict) and key in entries:
+            entry = entries[key]
+            if self.ttl and time.time() - entry.get('timestamp', 0) > self.ttl:
+                _logger.debug(f'{self.namespace} entry {key} expired')
+            else:
+                value = entry.get('value')
+
+        return value
+
+
+    def put_entry(self, server:str, key:str, value, user:str = '') -> bool:
+        '''
+        Store a single keyed entry for server and user
+
+        Parameters:
+            server:str = Jira server URL
+            key:str = Entry key
+            value = JSON serialisable data
+            user:str = Jira user
+
+        Returns:
+            bool indicating whether the cache was written
+        '''
+        with self._lock:
+            entries = self.get(server, user)
+            if not isinstance(entries, dict):
+                entries = {}
+            entries[key] = { 'timestamp': time.time(), 'value': value }
+            status = self.put(server, entries, user)
+
+        return status
+
+
+class LRU_CACHE():
+    '''
+    Thread safe, size bounded in-memory cache with optional TTL
+    '''
+
+    def __init__(self, maxsize:int = 128, ttl:int = 3600):
+        '''
+        Initial Values
+
+        Parameters:
+            maxsize:int = Maximum number of entries held
+            ttl:int = Time to live in seconds, 0 disables expiry
+        '''
+        self.maxsize:int = maxsize
+        self.ttl:int = ttl
+        self.hits:int = 0
+        self.misses:int = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+        return
+
+
+    def get(self, key):
+        '''
+        Retrieve value for key, marking it as most recently used
+
+        Returns:
+            Cached value or None if missing or expired
+        '''
+        value = None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                timestamp, value = entry
+                if self.ttl and time.time() - timestamp > self.ttl:
+                    del self._entries[key]
+                    value = None
+                else:
+                    self._entries.move_to_end(key)
+
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return value
+
+
+    def put(self, key, value):
+        '''
+        Store value for key, evicting the least recently used entry
+        when the cache is full
+        '''
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+        return
+
+
+    def invalidate(self, key = None):
+        '''
+        Remove key from the cache, or everything if key is None
+        '''
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+        return
+
+
+    def stats(self) -> dict:
+        '''
+        Cache statistics
+
+        Returns:
+            dict of size, maxsize, ttl, hits and misses
+        '''
+        with self._lock:
+            stats = { 'size': len(self._entries),
+                      'maxsize': self.maxsize,
+                      'ttl': self.ttl,
+                      'hits': self.hits,
+                      'misses': self.misses }
+
+        return stats
@@ -5,19 +5,21 @@ import issues
 s = issues.ISSUES('/Users/marrison/Projects/configs/jira.ini')
 d = issues.ISSUES('/Users/marrison/Projects/configs/jira.ini')
 
+# One sweep of IFR for the RFE # field rather than fetching each IFR issue
+index = migration.MIGRATION_INDEX()
+index.sweep(d, project='IFR')
+
 f = open('reporters.txt', 'w')
 
-for n in range(2,615):
-    d.get_issue(f'IFR-{n}')
-    rfe = d.issue.fields.customfield_14487
+for rfe, ifr in index.items(project='IFR'):
+    d.get_issue(ifr)
     s.get_issue(rfe)
     id = s.get_reporter_id()
-    if d.update_reporter(id):
-        print(f'IFR-{n}: Success')
-        print(f'IFR-{n}: Success', file=f) 
+    if d.update_reporter(accountId=id):
+        print(f'{ifr}: Success')
+        print(f'{ifr}: Success', file=f)
     else:
-        print(f'IFR-{n}: Failed')
-        print(f'IFR-{n}: Failed', file=f) 
-    
-    
+        print(f'{ifr}: Failed')
+        print(f'{ifr}: Failed', file=f)
+
 
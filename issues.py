@@ -11,7 +11,7 @@
 
  Author: Chris Marrison
 
- Date Last Updated: 20250529
+ Date Last Updated: 20261017
 
  Todo:
 
@@ -42,20 +42,35 @@
  POSSIBILITY OF SUCH DAMAGE.
 
 '''
-__version__ = '0.3.8'
+__version__ = '0.3.9'
 __author__ = 'Chris Marrison'
 __author_email__ = 'chris@infoblox.com'
 
 
 import logging
 import os
+import re
 import configparser
+import collections
+import concurrent.futures
+import copy
+import itertools
+import uuid
+import requests
 import jira
 import jira.exceptions
+import cache
+import mirror
+import jql_local
 from rich import print
 
 _logger = logging.getLogger(__name__)
 
+# createmeta schemas shared by every ISSUES object in the process
+_schema_cache = cache.LRU_CACHE(maxsize=64, ttl=3600)
+# Transition metadata keyed by (server, project, issuetype, status id)
+_transition_cache = cache.LRU_CACHE(maxsize=256, ttl=900)
+
 # Custom Exceptions
 class IniFileSectionError(Exception):
     '''
@@ -75,6 +90,95 @@ class APIKeyFormatError(Exception):
     '''
     pass
 
+class AmbiguousFieldError(Exception):
+    '''
+    Exception for a field name matching more than one field id
+    '''
+    pass
+
+
+class MULTIPART_STREAM():
+    '''
+    multipart/form-data body for a single file streamed from an
+    iterator of chunks, the length is known up front so requests sends
+    a Content-Length and reads the body a block at a time
+    '''
+
+    def __init__(self,
+                 chunks,
+                 filename:str,
+                 size:int,
+                 mime_type:str = 'application/octet-stream'):
+        '''
+        Initial Values
+
+        Parameters:
+            chunks = Iterator of bytes making up the file
+            filename:str = File name presented to the server
+            size:int = Exact size of the file in bytes
+            mime_type:str = Content type of the file
+        '''
+        boundary = uuid.uuid4().hex
+        filename = filename.replace('"', '%22').replace('\r', '').replace('\n', '')
+        self.head:bytes = ( f'--{boundary}\r\n'
+                            f'Content-Disposition: form-data; name="file"; '
+                            f'filename="{filename}"\r\n'
+                            f'Content-Type: {mime_type}\r\n\r\n' ).encode()
+        self.tail:bytes = f'\r\n--{boundary}--\r\n'.encode()
+        self.size:int = size
+        self.content_type:str = f'multipart/form-data; boundary={boundary}'
+        self.sent:int = 0
+        self._parts = itertools.chain([ self.head ],
+                                      self._count(chunks),
+                                      [ self.tail ])
+        self._buffer:bytes = b''
+
+        return
+
+
+    def _count(self, chunks):
+        '''
+        Pass chunks through, checking the file matches the declared size
+        '''
+        for chunk in chunks:
+            self.sent += len(chunk)
+            if self.sent > self.size:
+                raise ValueError(f'File larger than declared size {self.size}')
+            yield chunk
+        if self.sent != self.size:
+            raise ValueError(f'File truncated at {self.sent} of {self.size} bytes')
+
+        return
+
+
+    def __len__(self) -> int:
+        return len(self.head) + self.size + len(self.tail)
+
+
+    def __iter__(self):
+        if self._buffer:
+            yield self._buffer
+            self._buffer = b''
+        yield from self._parts
+
+
+    def read(self, size:int = -1) -> bytes:
+        '''
+        Read up to size bytes, only the requested block is buffered
+        '''
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += next(self._parts)
+            except StopIteration:
+                break
+
+        if size < 0:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+
+        return data
+
 
 class ISSUES():
     '''
@@ -87,7 +191,13 @@ class ISSUES():
                  server:str = '',
                  user:str = '',
                  api_key:str = '',
-                 res_field:str = ''):
+                 res_field:str = '',
+                 jira_session:object = None,
+                 fields:list = None,
+                 use_cache:bool = True,
+                 cache_ttl:int = None,
+                 persist_schemas:bool = None,
+                 mirror_db:str = None):
         '''
         Initial Values
 
@@ -97,14 +207,33 @@ class ISSUES():
             user:str = Override inifile values
             api_key:str = Override inifile values
             res_field:str = Resolution field for transitions
+            jira_session:object = Existing jira.JIRA session to share
+            fields:list = Existing field catalog to share
+            use_cache:bool = Use the on-disk field catalog cache
+            cache_ttl:int = Field cache TTL in seconds (overides inifile value)
+            persist_schemas:bool = Keep createmeta schemas on disk between
+                                   runs (overides inifile value)
+            mirror_db:str = SQLite file of the local issue mirror
+                            (overides inifile value)
         '''
+        self.inifile:str = inifile
+        self.cfg:dict = {}
         self.server:str = server
         self.user:str = user
         self.api_key:str = api_key
         self.resolution_field:str = res_field
+        self.resolution_key:str = ''
         self.issue:object = None
-        self.fields:list = []
+        self.transitions:list = []
+        self.transitions_cached:bool = False
+        self.fields:list = fields if fields else []
         self.field_map:dict = {}
+        self.field_ids:dict = {}
+        self.field_names:dict = {}
+        self.field_cache:cache.DISK_CACHE = None
+        self.schema_cache:cache.DISK_CACHE = None
+        self.mirror:mirror.ISSUE_MIRROR = None
+        self.mirror_max_age:int = 3600
         self.summary_fields:list = [ 'Product',
                                      'Summary',
                                      'Reporter',
@@ -124,11 +253,30 @@ class ISSUES():
                 self.api_key = self.cfg.get('api_key')
             if not self.resolution_field:
                 self.resolution_field = self.cfg.get('resolution_field')
+
+        if use_cache:
+            if cache_ttl is None:
+                cache_ttl = int(self.cfg.get('field_cache_ttl', 86400))
+            self.field_cache = cache.DISK_CACHE('fields',
+                                    cache_dir=self.cfg.get('cache_dir',
+                                                    cache.DEFAULT_CACHE_DIR),
+                                    ttl=cache_ttl)
+            if persist_schemas is None:
+                persist_schemas = (self.cfg.get('persist_schemas', '')
+                                   .lower() in [ 'true', 'yes', '1' ])
+            if persist_schemas:
+                self.schema_cache = cache.DISK_CACHE('schemas',
+                                    cache_dir=self.cfg.get('cache_dir',
+                                                    cache.DEFAULT_CACHE_DIR),
+                                    ttl=_schema_cache.ttl)
         
         try:
-            # Set up jira session
-            self.jira_session = jira.JIRA(basic_auth=(self.user,self.api_key), 
-                                          server=self.server)
+            # Set up jira session, unless an existing one is shared
+            if jira_session:
+                self.jira_session = jira_session
+            else:
+                self.jira_session = jira.JIRA(basic_auth=(self.user,self.api_key), 
+                                              server=self.server)
             # Get fields and mappings
             self.get_fields()
 
@@ -137,6 +285,51 @@ class ISSUES():
         except:
             raise
 
+        # Optional local mirror of issues
+        if not mirror_db:
+            mirror_db = self.cfg.get('mirror_db')
+        if mirror_db:
+            self.mirror = mirror.ISSUE_MIRROR(mirror_db, self.server)
+            self.mirror_max_age = int(self.cfg.get('mirror_max_age', 3600))
+
+        return
+
+
+    def clone(self):
+        '''
+        Create a new ISSUES object that shares the authenticated session,
+        field catalog, field indexes, caches and mirror of this one. No
+        network calls are made and the field indexes are not rebuilt, so
+        a clone per issue or worker costs only the object itself
+
+        Returns:
+            ISSUES object with its own issue state
+        '''
+        # Shared state is only ever rebound, never mutated in place,
+        # see create_field_map() and get_fields()
+        new_issues = copy.copy(self)
+        new_issues.issue = None
+        new_issues.transitions = []
+        new_issues.transitions_cached = False
+        new_issues.summary_fields = list(self.summary_fields)
+
+        return new_issues
+
+    def set_pool_size(self, size:int):
+        '''
+        Resize the HTTP connection pool of the jira session so that
+        size threads sharing the session can each keep a connection open
+
+        Parameters:
+            size:int = Number of connections per host
+        '''
+        for adapter in self.jira_session._session.adapters.values():
+            if size > getattr(adapter, '_pool_maxsize', size):
+                adapter.init_poolmanager(adapter._pool_connections,
+                                         size,
+                                         block=adapter._pool_block)
+                _logger.debug(f'Connection pool resized to {size}')
+
         return
 
     # ** Facilitate ini file for basic configuration including API Key
@@ -162,6 +355,8 @@ class ISSUES():
         cfg = configparser.ConfigParser()
         config = {}
         ini_keys = ['server', 'user', 'api_key', 'resolution_field']
+        optional_keys = ['cache_dir', 'field_cache_ttl', 'persist_schemas',
+                         'mirror_db', 'mirror_max_age', 'query_cache_ttl']
     
         # Check for inifile and raise exception if not found
         if os.path.isfile(filename):
@@ -182,6 +377,10 @@ class ISSUES():
                         _logger.error(f'Key {key} not found in BloxOne section.')
                         raise IniFileKeyError(f'Key "{key}" not found within' +
                                 f'[JIRA] section of ini file {filename}')
+                for key in optional_keys:
+                    if key in cfg['JIRA']:
+                        config[key] = cfg['JIRA'][key].strip("'\"")
+                        _logger.debug(f'Key {key} found in {filename}: {config[key]}')
                         
             else:
                 _logger.error(f'No BloxOne Section in config file: {filename}')
@@ -193,24 +392,51 @@ class ISSUES():
         return config
 
 
-    def get_issue(self, issue:str, expand:str = None) -> bool:
+    def get_issue(self,
+                  issue:str,
+                  expand:str = None,
+                  fields:str = None,
+                  stale_ok:bool = False) -> bool:
         '''
         Get Jira issue and bind to self.issue
 
         Parameters:
             issue:str = issue key
             expand:str = value to pass to expand paramter
+            fields:str = Field ids to retrieve as a comma separated
+                         str or list, default all
+            stale_ok:bool = Use the local mirror copy if it is no older
+                            than self.mirror_max_age
         
         Returns:
             bool based on successfully retrieving the jira issue
         '''
         status:bool = False
+        # Transitions belong to the previously bound issue
+        self.transitions = []
+        self.transitions_cached = False
+        if isinstance(fields, list):
+            fields = ','.join(fields)
+
+        if stale_ok and self.mirror:
+            raw = self.mirror.get(issue, max_age=self.mirror_max_age)
+            if raw:
+                self.issue = self.issue_from_raw(raw)
+                _logger.debug(f'Retrieved {issue} from mirror')
+                return True
+
         try:
-            self.issue = self.jira_session.issue(issue, expand=expand)
+            self.issue = self.jira_session.issue(issue,
+                                                 fields=fields,
+                                                 expand=expand)
+            if not fields:
+                self.mirror_store(self.issue)
             status = True
             _logger.debug(f'Successfully retrieved {issue}')
         except:
             _logger.error(f'Failed to retrieve issue: {issue}')
+            # Don't leave a previous issue bound when the session is reused
+            self.issue = None
             status = False
         return status
 
@@ -262,12 +488,20 @@ class ISSUES():
 
     def get_transitions(self) -> bool:
         '''
-        Get transitions for and bind to self.transitions
+        Get transitions for and bind to self.transitions, using those
+        embedded in the issue when it was retrieved with
+        expand='transitions.fields' (see get_issue_transitions())
 
         Returns:
             False on error
         '''
         status:bool = False
+
+        if self.issue and 'transitions' in self.issue.raw:
+            self.transitions = self.issue.raw['transitions']
+            _logger.debug(f'Using embedded transitions for: {self.issue}')
+            return True
+
         try:
             self.transitions = self.jira_session.transitions(self.issue.id)
             _logger.debug(f'Successfully retrieved transitions for: {self.issue}')
@@ -278,6 +512,100 @@ class ISSUES():
         return status
     
     
+    def get_issue_transitions(self, issue:str) -> bool:
+        '''
+        Get Jira issue together with its transitions, including the
+        allowed field values, in a single request. Binds self.issue
+        and self.transitions
+
+        Parameters:
+            issue:str = issue key
+
+        Returns:
+            bool based on successfully retrieving the jira issue
+        '''
+        status:bool = False
+
+        if self.get_issue(issue, expand='transitions.fields'):
+            status = self.get_transitions()
+            if status:
+                _transition_cache.put(self.transition_cache_key(),
+                                      self.transitions)
+
+        return status
+
+
+    def transition_cache_key(self) -> tuple:
+        '''
+        Key for the transition metadata cache, issues in the same
+        project, issue type and status share the same transitions for
+        the same user
+
+        Returns:
+            tuple of (server, user, project, issuetype id, status id)
+        '''
+        return ( self.server,
+                 self.user,
+                 self.issue.fields.project.key,
+                 self.issue.fields.issuetype.id,
+                 self.issue.fields.status.id )
+
+
+    def load_transitions(self, issue:str) -> bool:
+        '''
+        Get Jira issue and bind transitions (with allowed field values)
+        from the transition metadata cache, falling back to a live
+        lookup on a cache miss
+
+        Parameters:
+            issue:str = issue key
+
+        Returns:
+            bool based on successfully retrieving issue and transitions
+        '''
+        status:bool = False
+
+        if self.get_issue(issue, fields='status,project,issuetype'):
+            cached = _transition_cache.get(self.transition_cache_key())
+            if cached:
+                self.transitions = cached
+                self.transitions_cached = True
+                _logger.debug(f'Using cached transitions for: {self.issue}')
+                status = True
+            else:
+                status = self.refresh_transitions()
+
+        return status
+
+
+    def refresh_transitions(self) -> bool:
+        '''
+        Invalidate cached transition metadata for the current issue's
+        workflow state and retrieve it live
+
+        Returns:
+            False on error
+        '''
+        status:bool = False
+        key = self.transition_cache_key()
+
+        _transition_cache.invalidate(key)
+        self.transitions_cached = False
+        try:
+            self.transitions = self.jira_session.transitions(self.issue.key,
+                                            expand='transitions.fields')
+            _transition_cache.put(key, self.transitions)
+            _logger.debug(f'Successfully retrieved transitions for: {self.issue}')
+            status = True
+        except jira.exceptions.JIRAError as err:
+            _logger.error(f'Failed to retrieve transitions for: {self.issue}')
+            _logger.debug(err)
+            self.transitions = []
+            status = False
+
+        return status
+
+
     def get_resolution_key(self) -> bool:
         '''
         Get key for named resolution and bind to self.resolution_key
@@ -296,18 +624,42 @@ class ISSUES():
         return status
 
 
-    def get_field_id(self, fieldname) -> str:
+    def get_field_id(self, fieldname:str, strict:bool = False) -> str:
         '''
-        Get id of an issue field
+        Get id of an issue field using the in-memory field index
+
+        Parameters:
+            fieldname:str = Field name or id, names are matched exactly
+                            first and then case-insensitively
+            strict:bool = Raise AmbiguousFieldError rather than using the
+                          first match when the name maps to several ids
+
+        Returns:
+            Field id or '' if not found
         '''
         id:str = ''
-        field_list:list
+        matches:list = []
 
-        field_list = self.jira_session.fields()
-        for f in field_list:
-            if f.get('name') == fieldname:
-                id = f.get('id')
-                break
+        if not self.field_ids:
+            self.create_field_map()
+
+        if fieldname in self.field_ids:
+            return fieldname
+
+        candidates = self.field_names.get(str(fieldname).lower(), [])
+        # Prefer an exact match on case, fall back to case-insensitive
+        matches = [ f for f in candidates if f.get('name') == fieldname ]
+        if not matches:
+            matches = candidates
+
+        if len(matches) > 1:
+            ids = [ f.get('id') for f in matches ]
+            if strict:
+                raise AmbiguousFieldError(f'Field "{fieldname}" matches {ids}')
+            _logger.warning(f'Field "{fieldname}" is ambiguous {ids}, ' +
+                            f'using {ids[0]}')
+        if matches:
+            id = matches[0].get('id')
         
         return id
 
@@ -335,6 +687,12 @@ class ISSUES():
                 id = t.get('id')
                 break
         
+        if not id and self.transitions_cached:
+            # Cached metadata may be stale for this issue, check live
+            _logger.debug(f'{transition} not in cached transitions, refreshing')
+            if self.refresh_transitions():
+                return self.transition_id(transition)
+
         if not id:
             _logger.warning(f'Cannot {transition} {self.issue.key} transition not available')
         
@@ -345,7 +703,12 @@ class ISSUES():
         '''
         '''
         id:str = ''
-        trns = self.jira_session.transitions(self.issue.key, expand='transitions.fields')
+
+        # Use transitions already retrieved with their fields if we can
+        if self.transitions and all('fields' in t for t in self.transitions):
+            trns = self.transitions
+        else:
+            trns = self.jira_session.transitions(self.issue.key, expand='transitions.fields')
         
         # Check for resolution and get allowed values
         for r in trns:
@@ -406,33 +769,55 @@ class ISSUES():
         '''
         fields:list = []
 
+        if not self.fields and self.field_cache:
+            # Warm start from the on-disk catalog
+            cached = self.field_cache.get(self.server, self.user)
+            if cached:
+                self.fields = cached
+
         if not self.fields:
             # Get fields from Jira
             try:
                 self.fields = self.jira_session.fields()
             except:
                 raise
+            if self.field_cache and self.fields:
+                self.field_cache.put(self.server, self.fields, self.user)
 
         if field and self.fields:
-            for f in self.fields:
-                if f.get('id') == field:
-                    fields = [ f ]
-                    break
-                elif f.get('name') == field:
-                    fields = [ f ]
-                    break
+            if not self.field_ids:
+                self.create_field_map()
+            id = self.get_field_id(field)
+            if id:
+                fields = [ self.field_ids[id] ]
         else:
             fields = self.fields
 
         return fields
     
 
+    def refresh_fields(self) -> bool:
+        '''
+        Invalidate the cached field catalog and reload it from Jira
+
+        Returns:
+            bool based on successfully rebuilding the field map
+        '''
+        if self.field_cache:
+            self.field_cache.invalidate(self.server, self.user)
+        self.fields = []
+
+        return self.create_field_map()
+
+
     def create_field_map(self) -> dict:
         '''
         '''
         status:bool = False
         fields:list = []
         fmap:dict = {}
+        ids:dict = {}
+        names:dict = {}
 
         try:
             fields = self.get_fields()
@@ -445,11 +830,15 @@ class ISSUES():
             for f in fields:
                 fmap.update( { f.get('id'): f.get('name'),
                                f.get('name'): f.get('id')} )
+                ids[f.get('id')] = f
+                names.setdefault(str(f.get('name')).lower(), []).append(f)
         else:
             _logger.error('Field mapping empty')
             status = False
 
         self.field_map = fmap
+        self.field_ids = ids
+        self.field_names = names
 
         return status
 
@@ -471,13 +860,28 @@ class ISSUES():
                    project:str = 'IFR',
                    issuetype:str='New Feature') -> dict:
         '''
-
+        Get the createmeta field schema for project and issuetype,
+        served from the LRU cache (and optional disk cache) when possible
         '''
         schema:list = []
+        # Create screens depend on the permissions of the user
+        key = (self.server, self.user, project, issuetype)
         
         if not self.field_map:
             self.create_field_map()
 
+        schema = _schema_cache.get(key)
+        if schema is None and self.schema_cache:
+            schema = self.schema_cache.get_entry(self.server,
+                                                 f'{project}/{issuetype}',
+                                                 user=self.user)
+            if schema:
+                _schema_cache.put(key, schema)
+        if schema:
+            _logger.debug(f'Using cached schema for {project} {issuetype}')
+            return schema
+
+        schema = []
         meta = self.jira_session.createmeta(projectKeys=project, 
                                             issuetypeNames=issuetype, 
                                             expand='projects.issuetypes.fields')
@@ -486,6 +890,12 @@ class ISSUES():
                 if meta['projects'][0]['issuetypes'][0].get('fields'):
                     # Get the fields for the first issue type
                     schema = meta['projects'][0]['issuetypes'][0]['fields']
+                    _schema_cache.put(key, schema)
+                    if self.schema_cache:
+                        self.schema_cache.put_entry(self.server,
+                                                    f'{project}/{issuetype}',
+                                                    schema,
+                                                    user=self.user)
                 else:
                     _logger.error(f'No fields found for {project} {issuetype}')
             else:
@@ -604,6 +1014,69 @@ class ISSUES():
         '''
         '''
         return self.issue.fields.comment.comments
+
+
+    def iter_comments(self,
+                      issue:str = None,
+                      page_size:int = 100,
+                      prefetch:bool = True):
+        '''
+        Yield every comment of issue, oldest first, from the paginated
+        comment endpoint rather than the list embedded in the issue,
+        which is truncated for long threads
+
+        Parameters:
+            issue:str = Issue key, default the current issue
+            page_size:int = Number of comments requested per page
+            prefetch:bool = Request the next page while the current
+                            page is being consumed
+
+        Yields:
+            dicts of raw comment data, id, author, body and created
+
+        Raises:
+            jira.exceptions.JIRAError
+        '''
+        key = issue or self.issue.key
+        seen:set = set()
+
+        # JIRA.comments() returns only the first page of the endpoint, so
+        # pages are read with the private _get_json(path, params), checked
+        # against jira 2.0 to 3.8. Fall back to comments() if it goes away
+        if not callable(getattr(self.jira_session, '_get_json', None)):
+            _logger.warning('JIRA._get_json() not available, using ' +
+                            'JIRA.comments(), long threads may be truncated')
+            for comment in self.jira_session.comments(key):
+                yield comment.raw
+            return
+
+        def get_page(start:int) -> dict:
+            return self.jira_session._get_json(f'issue/{key}/comment',
+                                               params={ 'startAt': start,
+                                                        'maxResults': page_size,
+                                                        'orderBy': 'created' })
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+            start = 0
+            page = get_page(start)
+            while True:
+                comments = page.get('comments', [])
+                start = page.get('startAt', start) + len(comments)
+                more = bool(comments) and start < page.get('total', 0)
+                pending = pool.submit(get_page, start) if more and prefetch else None
+                _logger.debug(f'Retrieved {len(comments)} comments for {key}')
+
+                for comment in comments:
+                    # Comments added meanwhile may shift the pages
+                    if comment['id'] not in seen:
+                        seen.add(comment['id'])
+                        yield comment
+
+                if not more:
+                    break
+                page = pending.result() if pending else get_page(start)
+
+        return
     
 
     def update_field(self, field:str, value:str) -> bool:
@@ -627,6 +1100,84 @@ class ISSUES():
         return status
 
 
+    def download_attachment(self,
+                            url:str,
+                            chunk_size:int = 1024 * 1024):
+        '''
+        Open a streaming download of an attachment
+
+        Parameters:
+            url:str = Attachment content URL
+            chunk_size:int = Bytes per chunk
+
+        Returns:
+            tuple of (response, chunk iterator), close the response
+            once the chunks are consumed
+
+        Raises:
+            requests.exceptions.HTTPError
+        '''
+        # Identity encoding so the bytes received match the attachment size
+        response = self.jira_session._session.get(url,
+                                                  stream=True,
+                                                  headers={ 'Accept-Encoding': 'identity' })
+        response.raise_for_status()
+
+        return response, response.iter_content(chunk_size=chunk_size)
+
+
+    def upload_attachment(self,
+                          chunks,
+                          filename:str,
+                          size:int,
+                          mime_type:str = 'application/octet-stream',
+                          issue:str = None) -> list:
+        '''
+        Attach a file to issue, streaming chunks straight into the
+        multipart request body
+
+        Parameters:
+            chunks = Iterator of bytes making up the file
+            filename:str = Attachment file name
+            size:int = Exact size of the file in bytes
+            mime_type:str = Content type of the file
+            issue:str = Issue key, default the current issue
+
+        Returns:
+            list of created attachment details
+
+        Raises:
+            requests.exceptions.RequestException for failed or non 2xx
+            requests, ValueError if chunks do not hold size bytes or
+            nothing was attached
+        '''
+        key = issue or self.issue.key
+        body = MULTIPART_STREAM(chunks, filename, size, mime_type=mime_type)
+        url = self.jira_session._get_url(f'issue/{key}/attachments')
+        # JIRA._session is the jira ResilientSession (checked against
+        # jira 3.8), whose request() retries 429 and 5xx responses by
+        # sending data again. A streamed body is consumed by the first
+        # attempt, so a retry would upload a truncated file. Call the
+        # plain requests.Session.request() on it instead, keeping its
+        # auth, headers and connection pool but making a single attempt.
+        # Failures are raised, a failed copy is made again from the
+        # start when the migration is resumed
+        response = requests.Session.request(self.jira_session._session,
+                                            'POST',
+                                            url,
+                                            data=body,
+                                            headers={ 'X-Atlassian-Token': 'no-check',
+                                                      'Content-Type': body.content_type })
+        # Non 2xx responses take the same path as connection errors
+        response.raise_for_status()
+        attached = response.json()
+        if not attached:
+            raise ValueError(f'No attachment created for {filename}')
+        _logger.info(f'Attached {filename} ({size} bytes) to {key}')
+
+        return attached
+
+
     def add_weblink(self, link:str, comment:str):
         '''
         '''
@@ -673,18 +1224,140 @@ class ISSUES():
         return status
 
 
+    def field_projection(self, names:list) -> list:
+        '''
+        Translate field names (or ids) into the list of field ids to
+        request from Jira, always including status
+
+        Parameters:
+            names:list = Field names or ids
+
+        Returns:
+            list of field ids
+        '''
+        projection:list = [ 'status' ]
+
+        for name in names:
+            id = self.get_field_id(name)
+            if id and id not in projection:
+                projection.append(id)
+            elif not id:
+                _logger.debug(f'Field {name} not found, not projected')
+
+        return projection
+
+
+    def get_issues(self,
+                   keys:list,
+                   fields:list = None,
+                   chunk_size:int = 100,
+                   max_jql:int = 2000) -> dict:
+        '''
+        Retrieve many issues using batched "key in (...)" JQL searches
+
+        Parameters:
+            keys:list = Issue keys
+            fields:list = Field ids to retrieve, default all navigable
+            chunk_size:int = Maximum keys per search
+            max_jql:int = Maximum length of the key list per search
+
+        Returns:
+            dict of requested key to jira issue, keys that were not
+            returned are logged and omitted. Moved issues are returned
+            under their current key by the search, so any requested key
+            left unmatched while others came back is retrieved on its own
+        '''
+        found:dict = {}
+        chunks:list = []
+        chunk:list = []
+        length:int = 0
+
+        # Remove blanks and duplicates, preserving order
+        keys = list(dict.fromkeys(k.strip().upper() for k in keys if k.strip()))
+
+        for key in keys:
+            if chunk and (len(chunk) >= chunk_size or
+                          length + len(key) + 3 > max_jql):
+                chunks.append(chunk)
+                chunk = []
+                length = 0
+            chunk.append(key)
+            length += len(key) + 3
+        if chunk:
+            chunks.append(chunk)
+
+        for chunk in chunks:
+            key_list = ', '.join(f'"{k}"' for k in chunk)
+            jql_query = f'key in ({key_list})'
+            try:
+                # validate_query=False skips unknown keys rather than failing
+                results = self.jira_session.search_issues(jql_query,
+                                                    maxResults=len(chunk),
+                                                    fields=fields,
+                                                    validate_query=False)
+                _logger.debug(f'Retrieved {len(results)} of {len(chunk)} issues')
+            except jira.exceptions.JIRAError as Err:
+                _logger.error(f'Failed to retrieve issues: {Err}')
+                continue
+
+            requested = set(chunk)
+            moved:int = 0
+            for issue in results:
+                if issue.key in requested:
+                    found[issue.key] = issue
+                else:
+                    moved += 1
+            if moved:
+                for key in chunk:
+                    if key not in found:
+                        issue = self.fetch_moved(key, fields=fields)
+                        if issue:
+                            found[key] = issue
+
+        for key in keys:
+            if key not in found:
+                _logger.warning(f'Issue {key} not found')
+
+        return found
+
+
+    def fetch_moved(self, key:str, fields:list = None):
+        '''
+        Retrieve a single issue that may have been moved, Jira follows
+        the old key to the current issue
+
+        Returns:
+            jira issue or None
+        '''
+        issue = None
+
+        try:
+            issue = self.jira_session.issue(key,
+                                            fields=','.join(fields) if fields else None)
+            _logger.debug(f'Issue {key} is now {issue.key}')
+        except jira.exceptions.JIRAError as Err:
+            _logger.debug(f'Issue {key}: {Err}')
+
+        return issue
+
+
     def query_field(self, 
                     project:str = 'IFR',
                     field:str = '',
-                    value:str = '' ) -> list:
+                    value:str = '',
+                    fields:list = [ 'key' ]) -> list:
         '''
+        Find keys of issues in project where field equals value
+
+        Parameters:
+            fields:list = Field ids to retrieve, only the key is needed
         '''
         issue_list:list = []
 
         jql_query = f'"{field}" = "{value}" AND project = "{project}"'
 
         try:
-            issues = self.jira_session.search_issues(jql_query)
+            issues = self.jira_session.search_issues(jql_query, fields=fields)
 
             if issues:
                 for issue in issues:
@@ -700,33 +1373,340 @@ class ISSUES():
         return issue_list
     
 
-    def jql_query(self, query:str = 'project = "IFR"') -> list:
+    def jql_query(self,
+                  query:str = 'project = "IFR"',
+                  fields:list = None,
+                  parallel:int = 1,
+                  keyset:bool = False,
+                  stale_ok:bool = False) -> list:
         '''
+        Run JQL query and return all matching issues as a list,
+        see iter_jql() to process large result sets incrementally
+
+        Parameters:
+            query:str = JQL query
+            fields:list = Field ids to retrieve, default all navigable
+            parallel:int = Number of pages to retrieve concurrently
+            keyset:bool = Page by issue id rather than offset
+            stale_ok:bool = Answer 'project = <KEY>' queries from the
+                            local mirror when the project is synced
         '''
         issue_list:list = []
 
+        if stale_ok:
+            issue_list = self.local_query(query)
+            if issue_list is not None:
+                return issue_list
+            issue_list = []
 
         try:
-            issues = self.jira_session.search_issues(query)
-
-            while len(issues):
-                _logger.debug(f'Found {len(issues)} issues, retrieving next page')
-                if issues:
-                    for issue in issues:
-                        _logger.debug(f'Matched issue: {issue.key}')
-                        issue_list.append(issue)
-                else:
-                    issue_list = []
-                    break
-                issues = self.jira_session.search_issues(query, startAt=len(issue_list))
-
+            issue_list = list(self.iter_jql(query,
+                                            fields=fields,
+                                            parallel=parallel,
+                                            keyset=keyset))
         except jira.exceptions.JIRAError as Err:
             _logger.error(Err)
             issue_list = []
         
         return issue_list
+
+
+    def iter_jql(self, 
+                 query:str = 'project = "IFR"',
+                 page_size:int = 100,
+                 fields:list = None,
+                 parallel:int = 1,
+                 keyset:bool = False):
+        '''
+        Run JQL query yielding matching issues page by page, so only
+        one page of issues is held in memory at a time
+
+        Parameters:
+            query:str = JQL query
+            page_size:int = Number of issues requested per page
+            fields:list = Field ids to retrieve, default all navigable
+            parallel:int = Number of pages to retrieve concurrently once
+                           the total is known from the first page, at
+                           most parallel pages are held in memory
+            keyset:bool = Order by issue key and continue each page
+                          from the last key returned, rather than using
+                          offsets. Any ORDER BY in the query is replaced.
+                          Keys only order within a project, so queries
+                          not restricted to one project use offsets
+
+        Yields:
+            jira issue objects
+
+        Raises:
+            jira.exceptions.JIRAError
+        '''
+        start:int = 0
+
+        if keyset and not jql_local.single_project(query):
+            _logger.info('Keyset pagination needs a single project query, ' +
+                         'using offsets')
+            keyset = False
+
+        if keyset:
+            if parallel > 1:
+                _logger.debug('Keyset pagination is sequential, ignoring parallel')
+            yield from self._iter_jql_keyset(query,
+                                             page_size=page_size,
+                                             fields=fields)
+            return
+
+        if parallel > 1:
+            yield from self._iter_jql_parallel(query,
+                                               page_size=page_size,
+                                               fields=fields,
+                                               parallel=parallel)
+            return
+
+        while True:
+            issues = self.jira_session.search_issues(query,
+                                                     startAt=start,
+                                                     maxResults=page_size,
+                                                     fields=fields)
+            _logger.debug(f'Retrieved {len(issues)} issues from {start}')
+            for issue in issues:
+                _logger.debug(f'Matched issue: {issue.key}')
+                if not fields:
+                    self.mirror_store(issue)
+                yield issue
+
+            start += len(issues)
+            # The server may return fewer than page_size, so use total
+            total = getattr(issues, 'total', None)
+            if not len(issues) or (total is not None and start >= total):
+                break
+
+        return
     
 
+    def local_query(self, query:str) -> list:
+        '''
+        Answer a query from the local mirror using the JQL subset
+        supported by jql_local. Only queries restricted to projects
+        synced within mirror_max_age are answered, as issues cached by
+        other fetches would give partial results
+
+        Parameters:
+            query:str = JQL query
+
+        Returns:
+            list of issues, or None if the mirror cannot answer
+        '''
+        issue_list:list = None
+        custom_fields:dict = {}
+
+        if self.mirror:
+            # Mirrored fields can be referenced by name or field id
+            for name, id in self.mirror_field_ids().items():
+                custom_fields.update({ name: name, id: name })
+            translator = jql_local.JQL_TRANSLATOR(custom_fields=custom_fields)
+            try:
+                where, params, order = translator.translate(query)
+            except jql_local.UnsupportedJQLError as err:
+                _logger.debug(f'Querying server, {err}')
+                return issue_list
+
+            if not translator.projects:
+                _logger.debug('Querying server, query is not restricted to a project')
+            elif not all(self.mirror.synced(p, max_age=self.mirror_max_age)
+                         for p in translator.projects):
+                _logger.debug(f'Querying server, {translator.projects} not synced recently')
+            else:
+                raws = self.mirror.select(where, params, order,
+                                          max_age=self.mirror_max_age)
+                _logger.debug(f'Answered {query} from mirror')
+                issue_list = [ self.issue_from_raw(raw) for raw in raws ]
+
+        return issue_list
+
+
+    def search_text(self, text:str, limit:int = 20) -> list:
+        '''
+        Ranked full text search of mirrored issue summaries,
+        descriptions and comments, falling back to a JQL text search
+        when no mirror is configured
+
+        Parameters:
+            text:str = Words to search for
+            limit:int = Maximum number of results
+
+        Returns:
+            list of dict with key and summary, best match first
+        '''
+        results:list = []
+
+        if self.mirror:
+            results = self.mirror.search(text, limit=limit)
+        elif text.strip():
+            _logger.info('No mirror configured, searching Jira')
+            words = ' '.join(text.split()).replace('\\', '\\\\').replace('"', '\\"')
+            try:
+                issues = self.jira_session.search_issues(f'text ~ "{words}"',
+                                                         maxResults=limit,
+                                                         fields=[ 'summary' ])
+                results = [ { 'key': i.key, 'summary': i.fields.summary }
+                            for i in issues ]
+            except jira.exceptions.JIRAError as err:
+                _logger.error(f'Text search failed: {err}')
+
+        return results
+
+
+    def mirror_field_ids(self) -> dict:
+        '''
+        Names and ids of the additional fields indexed by the mirror
+
+        Returns:
+            dict of field name to field id
+        '''
+        field_ids:dict = {}
+
+        for name in self.summary_fields:
+            id = self.get_field_id(name)
+            if id:
+                field_ids[name] = id
+
+        return field_ids
+
+
+    def mirror_store(self, issue):
+        '''
+        Write a fully retrieved issue through to the local mirror
+        '''
+        if self.mirror:
+            self.mirror.store(issue.raw, field_ids=self.mirror_field_ids())
+
+        return
+
+
+    def issue_from_raw(self, raw:dict):
+        '''
+        Build a jira issue object from raw issue JSON, e.g. from the
+        local mirror
+        '''
+        return jira.resources.Issue(self.jira_session._options,
+                                    self.jira_session._session,
+                                    raw=raw)
+
+
+    def sync_mirror(self, project:str, full:bool = False) -> int:
+        '''
+        Incrementally sync project into the local mirror
+
+        Parameters:
+            project:str = Project key
+            full:bool = Fetch every issue rather than recent updates
+
+        Returns:
+            Number of issues synced
+        '''
+        count:int = 0
+
+        if self.mirror:
+            try:
+                count = self.mirror.sync(self, project, full=full)
+            except jira.exceptions.JIRAError as Err:
+                _logger.error(f'Failed to sync {project}: {Err}')
+        else:
+            _logger.warning('No mirror configured, set mirror_db')
+
+        return count
+
+
+    def _iter_jql_keyset(self,
+                         query:str,
+                         page_size:int,
+                         fields:list):
+        '''
+        Keyset pagination for iter_jql() over a single project query,
+        each page is the next page_size issues with a key after the last
+        one returned, so deep pages cost the same as the first. Issue
+        keys compare by issue number within a project
+        '''
+        last_key:str = ''
+
+        # Replace any existing ordering with the issue key
+        condition = re.split(r'\border\s+by\b', query, flags=re.IGNORECASE)[0]
+        condition = condition.strip()
+        if condition != query.strip():
+            _logger.debug('ORDER BY replaced by key for keyset pagination')
+
+        while True:
+            if last_key:
+                page_query = f'({condition}) AND key > "{last_key}" ORDER BY key ASC'
+            else:
+                page_query = f'{condition} ORDER BY key ASC'
+
+            issues = self.jira_session.search_issues(page_query,
+                                                     maxResults=page_size,
+                                                     fields=fields)
+            _logger.debug(f'Retrieved {len(issues)} issues after {last_key or "start"}')
+            for issue in issues:
+                yield issue
+            if len(issues):
+                last_key = issues[-1].key
+
+            # total counts the issues remaining after last_key
+            total = getattr(issues, 'total', None)
+            if not len(issues) or (total is not None and len(issues) >= total):
+                break
+
+        return
+
+
+    def _iter_jql_parallel(self,
+                           query:str,
+                           page_size:int,
+                           fields:list,
+                           parallel:int):
+        '''
+        Fan out the page requests of iter_jql() after the first page,
+        yielding issues in page order and deduplicated by key
+        '''
+        seen:set = set()
+        self.set_pool_size(parallel)
+
+        def get_page(start:int):
+            return self.jira_session.search_issues(query,
+                                                   startAt=start,
+                                                   maxResults=page_size,
+                                                   fields=fields)
+
+        first = get_page(0)
+        total = getattr(first, 'total', None)
+        # The server may cap the page size below the requested value
+        step = len(first)
+        _logger.debug(f'Retrieved {step} of {total} issues, fetching remaining pages')
+
+        pages = [ first ]
+        offsets = iter(range(step, total, step) if step and total else [])
+        with concurrent.futures.ThreadPoolExecutor(max_workers=parallel) as pool:
+            pending = collections.deque()
+            for offset in offsets:
+                pending.append(pool.submit(get_page, offset))
+                if len(pending) >= parallel:
+                    break
+
+            while pages:
+                for issue in pages.pop(0):
+                    # Results may shift between pages if issues change
+                    if issue.key not in seen:
+                        seen.add(issue.key)
+                        yield issue
+                if pending:
+                    pages.append(pending.popleft().result())
+                    # Keep the window of in flight requests full
+                    for offset in offsets:
+                        pending.append(pool.submit(get_page, offset))
+                        break
+
+        return
+
+
     def get_reporter_id(self):
         '''
         '''
@@ -11,7 +11,7 @@
 
  Author: Chris Marrison
 
- Date Last Updated: 20241127
+ Date Last Updated: 20261017
 
  Todo:
 
@@ -42,7 +42,7 @@
  POSSIBILITY OF SUCH DAMAGE.
 
 '''
-__version__ = '0.2.3'
+__version__ = '0.2.4'
 __author__ = 'Chris Marrison'
 __author_email__ = 'chris@infoblox.com'
 
@@ -56,19 +56,65 @@ import datetime
 import time
 import argparse
 import csv
+import threading
+import concurrent.futures
 from rich import print
 
 
 # --- Functions
 
+def attempt_transition(r:issues.ISSUES,
+                       transition:str,
+                       resolution:str = None,
+                       target:str = None,
+                       comment:str = None) -> tuple:
+    '''
+    Attempt transition of the issue bound to r using its bound transitions
+
+    Returns:
+        tuple of (status, transition_id, resolution_id)
+    '''
+    status:bool = False
+    resolution_id = None
+
+    transition_id = r.transition_id(transition)
+    if transition_id:
+        if transition == 'Close':
+            resolution_id = r.resolution_id(transition, resolution)
+
+        # Attempt transition
+        if resolution_id:
+            status = r.transition_issue(t_id=transition_id,
+                                    r_id=resolution_id,
+                                    comment=comment)
+        elif target:
+            status = r.transition_issue(t_id=transition_id,
+                                        target=target,
+                                        comment=comment)
+        else:
+            status = r.transition_issue(t_id=transition_id,
+                                        comment=comment)
+    else:
+        # Transition not possible
+        status = False
+
+    return status, transition_id, resolution_id
+
+
 def process_issue(config:str, 
                 issue:str, 
                 transition:str, 
                 resolution:str=None,
                 target:str=None,
                 comment:str=None,
-                server:str=None) -> bool:
+                server:str=None,
+                jira_issues:issues.ISSUES = None) -> bool:
     '''
+    Transition a single issue
+
+    Parameters:
+        jira_issues:issues.ISSUES = Existing ISSUES object to reuse,
+                                    a new one is created if not supplied
     '''
     status:bool = False
     transition_id = None
@@ -76,33 +122,38 @@ def process_issue(config:str,
 
 
     try:
-        r = issues.ISSUES(inifile=config, server=server)
-        r.get_issue(issue)
-        r.get_transitions()
-        r.get_resolution_key()
-    
+        if jira_issues:
+            r = jira_issues
+        else:
+            r = issues.ISSUES(inifile=config, server=server)
+        if jira_issues:
+            # Bulk mode, issues in the same workflow state share the
+            # cached transition metadata
+            loaded = r.load_transitions(issue)
+        else:
+            # Issue, transitions and allowed resolutions in one request
+            loaded = r.get_issue_transitions(issue)
+        if not loaded:
+            return False
+        if not r.resolution_key:
+            r.get_resolution_key()
+
         current_status = r.status()
         current_status_id = r.status_id()
-        transition_id = r.transition_id(transition)
-        if transition_id:
-            if transition == 'Close':
-                resolution_id = r.resolution_id(transition, resolution)
-
-            # Attempt transition
-            if resolution_id:
-                status = r.transition_issue(t_id=transition_id,
-                                        r_id=resolution_id,
-                                        comment=comment)
-            elif target:
-                status = r.transition_issue(t_id=transition_id,
-                                            target=target,
-                                            comment=comment)
-            else:
-                status = r.transition_issue(t_id=transition_id,
-                                            comment=comment)
-        else:
-            # Transition not possible
-            status = False
+        status, transition_id, resolution_id = attempt_transition(r,
+                                                    transition,
+                                                    resolution=resolution,
+                                                    target=target,
+                                                    comment=comment)
+        if not status and r.transitions_cached:
+            # Cached metadata may not apply to this issue, retry live
+            logging.debug(f'{issue}: retrying with live transition metadata')
+            if r.refresh_transitions():
+                status, transition_id, resolution_id = attempt_transition(r,
+                                                    transition,
+                                                    resolution=resolution,
+                                                    target=target,
+                                                    comment=comment)
         if status:
             logging.info(f'{issue} moved from {current_status} to {transition} successfully')
         else:
@@ -130,25 +181,61 @@ def process_file(in_file:str,
                  resolution:str = '',
                  target:str = '',
                  comment:str ='',
-                 server:str = None):
+                 server:str = None,
+                 workers:int = 1):
     '''
+    Transition the issues listed in in_file
+
+    Parameters:
+        workers:int = Number of issues to process concurrently, each
+                      worker thread uses a clone of one shared session
     '''
     count:int = 0
     success_count:int = 0
     try:
-        f = open(in_file)
-        for issue in f:
-            issue = issue.rstrip()
+        # One session and field catalog shared by every issue in the file
+        r = issues.ISSUES(inifile=config, server=server)
+        with open(in_file) as f:
+            issue_list = [ line.rstrip() for line in f ]
+
+        if workers > 1:
+            r.set_pool_size(workers)
+            local = threading.local()
+
+            def worker(issue:str) -> bool:
+                # Per thread issue state, shared session and field catalog
+                if not hasattr(local, 'r'):
+                    local.r = r.clone()
+                return process_issue(config=config,
+                                     issue=issue,
+                                     transition=transition,
+                                     resolution=resolution,
+                                     target=target,
+                                     comment=comment,
+                                     server=server,
+                                     jira_issues=local.r)
+
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+                # map() returns results in input order
+                results = list(pool.map(worker, issue_list))
+        else:
+            results = []
+            for issue in issue_list:
+                results.append(process_issue(config=config, 
+                                             issue=issue,
+                                             transition=transition,
+                                             resolution=resolution,
+                                             target=target,
+                                             comment=comment,
+                                             server=server,
+                                             jira_issues=r))
+
+        for issue, result in zip(issue_list, results):
             count += 1
-            if process_issue(config=config, 
-                        issue=issue,
-                        transition=transition,
-                        resolution=resolution,
-                        target=target,
-                        comment=comment,
-                        server=server):
-                
+            if result:
                 success_count += 1
+                if workers > 1:
+                    logging.info(f'{issue}: processed successfully')
             else:
                 logging.error(f'Failed to process Issue: {issue}')
         logging.info(f'{success_count} of {count} Issues processed successfully')
@@ -159,15 +246,24 @@ def process_file(in_file:str,
     return
 
 
-def status_check(issue:str, config:str):
+def status_check(issue:str,
+                 config:str,
+                 jira_issues:issues.ISSUES = None,
+                 server:str = None):
     '''
     '''
     status = False
     try:
-        r = issues.ISSUES(issue=issue, inifile=config)
-        current_status = r.status()
-        logging.info(f'{issue} status: {current_status}')
-        status = True
+        if jira_issues:
+            r = jira_issues
+        else:
+            r = issues.ISSUES(inifile=config, server=server)
+        if r.get_issue(issue):
+            current_status = r.status()
+            logging.info(f'{issue} status: {current_status}')
+            status = True
+        else:
+            logging.error(f'{issue}: Failed to get current status')
     except:
         logging.error(f'{issue}: Failed to get current status')
 
@@ -175,18 +271,26 @@ def status_check(issue:str, config:str):
 
 
 def bulk_status_check(in_file:str, 
-                 config:str):
+                      config:str,
+                      server:str = None):
     '''
+    Report status of the issues in in_file using batched searches
     '''
     count:int = 0
     success_count:int = 0
     try:
-        f = open(in_file)
-        for issue in f:
-            issue = issue.rstrip()
+        r = issues.ISSUES(inifile=config, server=server)
+        with open(in_file) as f:
+            issue_list = [ line.strip() for line in f if line.strip() ]
+        found = r.get_issues(issue_list, fields=[ 'status' ])
+        for issue in issue_list:
             count += 1
-            if status_check(issue, config):
+            if issue.upper() in found:
+                r.issue = found[issue.upper()]
+                logging.info(f'{issue} status: {r.status()}')
                 success_count += 1
+            else:
+                logging.error(f'{issue}: Missing, failed to get current status')
         logging.info(f'{success_count} of {count} Jira Issues processed successfully')
     
     except:
@@ -223,10 +327,30 @@ def parseargs():
                         help='Update Reporter')
     parse.add_argument('-t', '--transition', type=str, 
                         help='Transition (case-sensitive)')
+    parse.add_argument('--status', action='store_true',
+                        help='Report the current status of issue(s)')
     parse.add_argument('-r', '--resolution', type=str, 
                         help='Transition resolution code, default="Field Cleanup May 2024"')
     parse.add_argument('-T', '--target', type=str, 
                         help='Target release for transition to Planned')
+    parse.add_argument('-M', '--mappings', type=str, default='',
+                        help="JSON file of field, option, component and version remappings")
+    parse.add_argument('-w', '--workers', type=int, default=1,
+                        help='Number of issues to process concurrently')
+    parse.add_argument('-W', '--stage-workers', type=str, default='',
+                        help='Migration workers per stage, e.g. fetch=4,create=2,enrich=4')
+    parse.add_argument('-j', '--journal', type=str, default='',
+                        help='Migration journal, default <file>.journal.jsonl')
+    parse.add_argument('--resume', action='store_true',
+                        help='Resume a bulk migration from its journal')
+    parse.add_argument('-P', '--plan', type=str,
+                        help='Write a validated migration plan for --file without migrating')
+    parse.add_argument('-E', '--execute', type=str,
+                        help='Execute a migration plan written with --plan')
+    parse.add_argument('--transfers', type=int, default=2,
+                        help='Maximum concurrent attachment transfers, default 2')
+    parse.add_argument('--no-attachments', action='store_true',
+                        help='Do not copy attachments when migrating')
     parse.add_argument('-C', '--comment', type=str, default="Issue status modified via JiraAPI",
                         help='Transition comment')
     parse.add_argument('-s', '--silent', action='store_true', 
@@ -243,7 +367,8 @@ def summarise_issue(args, server):
     '''
     '''
     issue = issues.ISSUES(inifile=args.config, server=server)
-    issue.get_issue(args.issue)
+    issue.get_issue(args.issue,
+                    fields=issue.field_projection(issue.summary_fields))
     print(issue.summarise_issue())
 
     return
@@ -256,12 +381,19 @@ def summarise_file(args, server):
 
     JIRA  = issues.ISSUES(inifile=args.config, server=server)
     with open(args.file) as f:
-        for line in f:
-            line = line.rstrip()
-            JIRA.get_issue(line)
+        issue_list = [ line.strip() for line in f if line.strip() ]
+
+    # Batch retrieve only the fields read by summarise_issue()
+    found = JIRA.get_issues(issue_list,
+                    fields=JIRA.field_projection(JIRA.summary_fields))
+    for issue in issue_list:
+        if issue.upper() in found:
+            JIRA.issue = found[issue.upper()]
             summary = JIRA.summarise_issue()
             results.append(summary)
             logging.info(summary)
+        else:
+            logging.error(f'{issue}: Missing, not summarised')
     
     return results
 
@@ -284,17 +416,43 @@ def csv_output(data, out:str = ''):
     return
 
 
-def issue_migration(args, server, issue:str = None):
+def migration_context(args, server, project:str = 'IFR'):
+    '''
+    Load the shared migration state once per run, including the
+    RFE -> IFR mapping index built with a single sweep of project
+
+    Returns:
+        migration.MIGRATION_CONTEXT
+    '''
+    context = migration.MIGRATION_CONTEXT(dst_project=project,
+                                          inifile=args.config,
+                                          server=server,
+                                          mappings=args.mappings,
+                                          transfers=args.transfers)
+    count = context.build_index()
+    logging.info(f'Migration index contains {count} issues')
+
+    return context
+
+
+def issue_migration(args, server, issue:str = None, context = None):
     '''
     '''
     status:bool = False
     JIRA:object = None
 
+    if not context:
+        context = migration.MIGRATION_CONTEXT(inifile=args.config,
+                                              server=server,
+                                              mappings=args.mappings,
+                                              transfers=args.transfers)
+
     if issue:
         try:
             JIRA = migration.MIGRATE_ISSUE(issue=issue,
                                             inifile=args.config,
-                                            server=server)
+                                            server=server,
+                                            context=context)
             logging.info(f'Migrating specified issue {issue}')
         except AssertionError:
             logging.error(f'{issue} not found, aborting migration.')
@@ -304,7 +462,8 @@ def issue_migration(args, server, issue:str = None):
         try:
             JIRA = migration.MIGRATE_ISSUE(issue=args.issue,
                                             inifile=args.config,
-                                            server=server)
+                                            server=server,
+                                            context=context)
             logging.info(f'Migrating issue {args.issue}')
         except AssertionError:
             logging.error(f'{args.issue} not found, aborting migration.')
@@ -312,7 +471,7 @@ def issue_migration(args, server, issue:str = None):
             JIRA = None
 
     if JIRA:
-        response = JIRA.mrate_issue()
+        response = JIRA.migrate_issue(include_attachments=not args.no_attachments)
         if response:
             if 'previously' not in response:
                 logging.info(f"Successfully submitted {JIRA.src.issue.key} to {JIRA.dst.issue.key}")
@@ -328,24 +487,99 @@ def issue_migration(args, server, issue:str = None):
     return status
 
 
+def stage_workers(args) -> dict:
+    '''
+    Worker count per migration stage, --workers applies to every stage
+    and --stage-workers overrides individual stages, e.g. enrich=4
+
+    Returns:
+        dict of stage: workers
+    '''
+    workers:dict = { stage: args.workers
+                     for stage in migration.MIGRATION_PIPELINE.STAGES }
+
+    if args.stage_workers:
+        for item in args.stage_workers.split(','):
+            stage, _, count = item.partition('=')
+            stage = stage.strip()
+            if stage in workers and count.strip().isdigit():
+                workers[stage] = int(count)
+            else:
+                logging.warning(f'Ignoring stage worker setting {item}')
+
+    return workers
+
+
 def bulk_migration(args, server):
     '''
+    Migrate the issues in args.file through the staged pipeline
     '''
     try:
-        f = open(args.file)
-        for line in f:
-            issue = line.rstrip()
-            issue_migration(args, server, issue=issue)
+        with open(args.file) as f:
+            # Each issue once, in file order
+            keys = list(dict.fromkeys(line.strip().upper()
+                                      for line in f if line.strip()))
+    except FileNotFoundError:
+        logging.error(f'File {args.file} not found.')
+        raise
+
+    context = migration_context(args, server)
+    workers = stage_workers(args)
+    journal = migration.MIGRATION_JOURNAL(args.journal or f'{args.file}.journal.jsonl')
+    logging.info(f'Migrating {len(keys)} issues with workers {workers}, ' +
+                 f'journal {journal.filename}')
+    pipeline = migration.MIGRATION_PIPELINE(context,
+                                            workers=workers,
+                                            journal=journal,
+                                            resume=args.resume,
+                                            include_attachments=not args.no_attachments)
+    pipeline.run(keys)
+
+    return
+
+
+def plan_migration(args, server):
+    '''
+    Build and validate the migration plan for the issues in args.file
+    without writing to the destination
+    '''
+    try:
+        with open(args.file) as f:
+            keys = [ line.strip() for line in f if line.strip() ]
     except FileNotFoundError:
         logging.error(f'File {args.file} not found.')
         raise
 
+    context = migration_context(args, server)
+    plan = migration.MIGRATION_PLAN(context, args.plan)
+    counts = plan.build(keys)
+    logging.info(f'Plan written to {args.plan}: {counts}')
+
+    return counts
+
+
+def execute_plan(args, server):
+    '''
+    Execute a migration plan, streaming planned entries through the
+    create and enrich stages of the pipeline
+    '''
+    context = migration_context(args, server)
+    plan = migration.MIGRATION_PLAN(context, args.execute)
+    workers = stage_workers(args)
+    journal = migration.MIGRATION_JOURNAL(args.journal or f'{args.execute}.journal.jsonl')
+    logging.info(f'Executing plan {args.execute} with workers {workers}, ' +
+                 f'journal {journal.filename}')
+    pipeline = migration.MIGRATION_PIPELINE(context,
+                                            workers=workers,
+                                            journal=journal,
+                                            resume=args.resume,
+                                            include_attachments=not args.no_attachments)
+    pipeline.run(plan.read())
+
     return
 
 
-def update_reporter(args, server, issue:str = None):
-                    
-                    
+def update_reporter(args, server, issue:str = None, context = None):
     '''
     '''
     status:bool = False
@@ -358,7 +592,8 @@ def update_reporter(args, server, issue:str = None):
         try:
             JIRA = migration.MIGRATE_ISSUE(issue=issue,
                                             inifile=args.config,
-                                            server=server)
+                                            server=server,
+                                            context=context)
             logging.info(f'Copying reporter for issue {issue}')
         except AssertionError:
             logging.error(f'{issue} not found, aborting migration.')
@@ -385,11 +620,12 @@ def bulk_update_reporter(args,
                        server):
     '''
     '''
+    context = migration_context(args, server)
     try:
         f = open(args.file)
         for line in f:
             issue = line.rstrip()
-            update_reporter(args, server, issue=issue)
+            update_reporter(args, server, issue=issue, context=context)
     except FileNotFoundError:
         logging.error(f'File {args.file} not found.')
         raise
@@ -452,12 +688,21 @@ def main():
             summary = summarise_file(args, server)
             csv_output(summary, out=args.output)
         
+        # Plan migration of issues from file
+        case (None, args.file, False, True, _, False) if args.plan and args.file:
+            plan_migration(args, server)
+
+        # Execute a migration plan, matched before Migrate Issue as
+        # args.issue is None here
+        case (None, None, False, True, _, False) if args.execute:
+            execute_plan(args, server)
+
         # Migrate Issue
-        case (args.issue, None, False, True, _, False):
+        case (args.issue, None, False, True, _, False) if args.issue:
             issue_migration(args, server, issue=args.issue)
 
         # Migrate issues from file
-        case (None, args.file, False, True, _, False):
+        case (None, args.file, False, True, _, False) if args.file:
             bulk_migration(args, server)
         
         # Update Reporter on Issue
@@ -468,8 +713,16 @@ def main():
         case (None, args.file, False, False, _, True):
             bulk_update_reporter(args, server)
         
+        # Status of Issue
+        case (args.issue, None, False, False, None, False) if args.status and args.issue:
+            status_check(args.issue, config=args.config, server=server)
+
+        # Status of issues from file
+        case (None, args.file, False, False, None, False) if args.status and args.file:
+            bulk_status_check(in_file=args.file, config=args.config, server=server)
+
         # Transition Issue
-        case (args.issue, None, False, False, args.transition):
+        case (args.issue, None, False, False, args.transition, False) if args.issue and args.transition:
             process_issue(config=args.config,
                           issue=args.issue,
                           transition=args.transition,
@@ -479,14 +732,15 @@ def main():
                           server=server)
 
         # Transition issues from file
-        case (None, args.file, False, False, args.transition):
+        case (None, args.file, False, False, args.transition, False) if args.file and args.transition:
             process_file(in_file=args.file,
                          config=args.config,
                          transition=args.transition,
                          resolution=args.resolution,
                          target=args.target,
                          comment=args.comment,
-                         server=server)
+                         server=server,
+                         workers=args.workers)
 
         case _:
             print('no matches')
@@ -12,7 +12,7 @@
 
  Author: Chris Marrison
 
- Date Last Updated: 20250604
+ Date Last Updated: 20261017
 
  Todo:
 
@@ -43,7 +43,7 @@
  POSSIBILITY OF SUCH DAMAGE.
 
 '''
-__version__ = '0.2.2'
+__version__ = '0.2.3'
 __author__ = 'Chris Marrison'
 __author_email__ = 'chris@infoblox.com'
 
@@ -52,14 +52,20 @@ import logging
 import os
 import cmd
 import shlex
+import time
 import readline  # For command history
 import argparse
 from rich import print
 from issues import ISSUES
+import cache
 import migration
+import jira_automation
 
 _logger = logging.getLogger(__name__)
 
+# Larger result sets are not kept in the query cache
+QUERY_CACHE_LIMIT:int = 5000
+
 class JiraShell(cmd.Cmd):
     print(f'[bold green]Jira CLI v{__version__}[/bold green]')
     print(f'[bold blue]Author: {__author__}[/bold blue]')
@@ -74,6 +80,13 @@ class JiraShell(cmd.Cmd):
         self.issues = ISSUES(inifile=inifile)
         print(f'Connected to Jira: {self.issues.server}')
         self.current_issue = None
+        # Allow answers from the local mirror (see mirror_db)
+        self.stale = False
+        # Per session cache of query results
+        self.query_cache = cache.LRU_CACHE(maxsize=32,
+                            ttl=int(self.issues.cfg.get('query_cache_ttl', 300)))
+        # Migration state, loaded on first use of migrate
+        self.migration_context = None
         return
 
     def preloop(self):
@@ -157,6 +170,28 @@ class JiraShell(cmd.Cmd):
         
         return
 
+    def changed(self):
+        '''
+        Invalidate cached query results after the shell changes an issue
+        '''
+        self.query_cache.invalidate()
+        _logger.debug('Query cache cleared')
+        return
+
+
+    def do_cache(self, arg):
+        "Manage the query result cache: cache clear | cache stats"
+        if arg.strip() == 'clear':
+            self.query_cache.invalidate()
+            print("Query cache cleared.")
+        elif arg.strip() == 'stats':
+            for key, value in self.query_cache.stats().items():
+                print(f"{key}: {value}")
+        else:
+            print("Usage: cache clear | cache stats")
+        return
+
+
     def do_reconnect(self, arg):
         "Reconnect to Jira: reconnect"
         self.issues = ISSUES(inifile=self.inifile)
@@ -164,10 +199,20 @@ class JiraShell(cmd.Cmd):
         return
 
 
+    def do_refresh(self, arg):
+        "Reload the field catalog from Jira, bypassing the cache: refresh"
+        if self.issues.refresh_fields():
+            print(f'Field catalog reloaded: {len(self.issues.fields)} fields')
+            self.migration_context = None
+        else:
+            print('Failed to reload field catalog.')
+        return
+
+
     def do_get(self, arg):
         "Get an issue by key: get <ISSUE-KEY>"
         if arg:
-            if self.issues.get_issue(arg):
+            if self.issues.get_issue(arg, stale_ok=self.stale):
                 self.current_issue = arg
                 print(f"Issue {arg} loaded.")
             else:
@@ -304,6 +349,7 @@ class JiraShell(cmd.Cmd):
                 issue_dict = self.issues.create_issue_dict(summary, description)
                 if self.issues.create_issue(issue_dict):
                     print("Issue created successfully.")
+                    self.changed()
                 else:
                     print("Failed to create issue.")
         except ValueError:
@@ -319,6 +365,7 @@ class JiraShell(cmd.Cmd):
             comment = arg if arg else ""
             if self.issues.add_comment(comment):
                 print("Comment added.")
+                self.changed()
             else:
                 print("Failed to add comment.")
         else:
@@ -378,6 +425,7 @@ class JiraShell(cmd.Cmd):
             field, value = parts[0], " ".join(parts[1:])
             if self.issues.update_field(field, value):
                 self.write_output("Field updated.")
+                self.changed()
             else:
                 print("Failed to update field.")
         except ValueError:
@@ -393,6 +441,7 @@ class JiraShell(cmd.Cmd):
             try:
                 if self.issues.update_field('RFE #', arg):
                     print("Field updated.")
+                    self.changed()
                 else:
                     print("Failed to update field.")
             except ValueError:
@@ -410,6 +459,7 @@ class JiraShell(cmd.Cmd):
         try:
             if self.issues.update_reporter(arg):
                 print("Reporter updated.")
+                self.changed()
             else:
                 print("Failed to update reporter.")
         except ValueError:
@@ -418,67 +468,141 @@ class JiraShell(cmd.Cmd):
     
 
     def do_query(self, arg):
-        "Query issues: query <JQL> <summary>\nUse quotes if your JQL contains spaces."
+        "Query issues: query <JQL> [summary] [parallel=<n>] [keyset]\nUse quotes if your JQL contains spaces."
         summary:bool = False
+        parallel:int = 1
+        keyset:bool = False
         issue_summary:str = ''
-        header:str = 'key,status,Summary,Reporter,Product,RFE #'
+        columns:list = [ 'status', 'Summary', 'Reporter', 'Product', 'RFE #' ]
+        header:str = 'key,' + ','.join(columns)
 
         real_args, filename = self.parse_redirection(arg)
         if real_args:
             parts = shlex.split(real_args)
-            if len(parts) > 1:
-                query = parts[0]
-                command = " ".join(parts[1:])
-                if command == 'summary':
+            query = parts[0]
+            for option in parts[1:]:
+                if option == 'summary':
                     summary = True
+                elif option == 'keyset':
+                    keyset = True
+                elif option.startswith('parallel='):
+                    try:
+                        parallel = int(option.split('=', 1)[1])
+                    except ValueError:
+                        print(f"Invalid value '{option}', ignoring.")
                 else:
-                    summary = False
+                    print(f"Unknown parameter '{option}', ignoring.")
 
+            # Only request the fields that are output, resolving the
+            # column ids once rather than per row
+            if summary:
+                projection = self.issues.field_projection(columns)
+                column_ids = [ self.issues.get_field_id(c) for c in columns ]
             else:
-                query = parts
-            try:
-                print("Executing JQL query...")
-                issues = self.issues.jql_query(query)
-            except Exception as e:
-                print(f"Error executing JQL query: {e}")
+                projection = self.issues.field_projection([ 'Summary' ])
+            _logger.debug(f'Field projection: {projection}')
 
-            if issues:
-                # Check if filename is provided
-                if filename:
-                    print(f"Writing output to {filename}")
-                if summary:
-                    # Output CSV Header
-                    self.write_output(header, filename=filename)
+            count:int = 0
+            # Results are cached by normalised JQL and projection
+            cache_key = (' '.join(query.split()), tuple(projection), keyset)
+            fetched:list = None
+            try:
+                results = None
+                if self.stale:
+                    results = self.issues.local_query(query)
+                if results is None:
+                    results = self.query_cache.get(cache_key)
+                    if results is not None:
+                        _logger.debug('Using cached query results')
+                if results is None:
+                    print("Executing JQL query...")
+                    # Output each page as it arrives rather than waiting
+                    # for the complete result set
+                    results = self.issues.iter_jql(query,
+                                                   fields=projection,
+                                                   parallel=parallel,
+                                                   keyset=keyset)
+                    fetched = []
+                for issue in results:
+                    if fetched is not None:
+                        if len(fetched) < QUERY_CACHE_LIMIT:
+                            fetched.append(issue)
+                        else:
+                            fetched = None
+                    if not count:
+                        # Check if filename is provided
+                        if filename:
+                            print(f"Writing output to {filename}")
+                        if summary:
+                            # Output CSV Header
+                            self.write_output(header, filename=filename)
 
-                for issue in issues:
-                    # self.issues.get_issue(issue)
                     status = issue.fields.status.name
                     issue_summary = issue.fields.summary
                     if summary:
-                        reporter = issue.fields.reporter.displayName
-                        # Check if custom field exists
-                        if hasattr(issue.fields, 'customfield_10114'):
-                            product = issue.fields.customfield_10114
-                        else:
-                            product = 'N/A'
-                        # Check if custom field exist
-                        if hasattr(issue.fields, 'customfield_14487'):
-                            rfe = issue.fields.customfield_14487
-                        else:
-                            rfe = 'N/A'
-
-                        issue_output = f'{issue.key},{status},{issue_summary},{reporter},{product},{rfe}'
+                        values = [ issue.key ]
+                        for column_id in column_ids:
+                            values.append(self.field_value(issue, column_id))
+                        issue_output = ','.join(values)
                     else:
                         issue_output = f'{issue}: {status}, {issue_summary}'
                     self.write_output(issue_output, filename=filename)
+                    count += 1
+                if fetched is not None:
+                    self.query_cache.put(cache_key, fetched)
+            except Exception as e:
+                print(f"Error executing JQL query: {e}")
 
+            if count:
                 # Output stats line
-                self.write_output(f"Found {len(issues)} issues", 
+                self.write_output(f"Found {count} issues", 
                                   filename=filename)
             else:
                 self.write_output("No issues found.", filename=filename)
         else:
-            print("Usage: query <JQL> <summary>")
+            print("Usage: query <JQL> [summary] [parallel=<n>] [keyset]")
+        return
+
+
+    def field_value(self, issue, field_id:str) -> str:
+        '''
+        Return printable value of field_id for issue or 'N/A'
+        '''
+        # Check if field exists
+        if not field_id or not hasattr(issue.fields, field_id):
+            return 'N/A'
+
+        value = getattr(issue.fields, field_id)
+        if hasattr(value, 'displayName'):
+            value = value.displayName
+        elif hasattr(value, 'name'):
+            value = value.name
+
+        return f'{value}'
+
+
+    def do_transition(self, arg):
+        "Transition the current issue: transition <transition> [resolution]\nUse quotes if values contain spaces."
+        if not self.current_issue:
+            print("No issue loaded. Use get <ISSUE-KEY> first.")
+            return
+        parts = shlex.split(arg)
+        if not parts:
+            print("Usage: transition <transition> [resolution]")
+            return
+        resolution = parts[1] if len(parts) > 1 else None
+        if jira_automation.process_issue(config=self.inifile,
+                                         issue=self.current_issue,
+                                         transition=parts[0],
+                                         resolution=resolution,
+                                         comment="Issue status modified via JiraAPI",
+                                         jira_issues=self.issues):
+            print(f"{self.current_issue} transitioned: {parts[0]}")
+            self.changed()
+        else:
+            print(f"Failed to transition {self.current_issue}.")
+        # Reload the full issue with its new status
+        self.issues.get_issue(self.current_issue)
         return
 
 
@@ -489,15 +613,18 @@ class JiraShell(cmd.Cmd):
             print("No issue loaded. Use get <ISSUE-KEY> first.")
             return
         elif 'RFE' in self.current_issue:
+            if not self.migration_context:
+                self.migration_context = migration.MIGRATION_CONTEXT(
+                                            jira_issues=self.issues)
             JIRA = migration.MIGRATE_ISSUE(issue=self.current_issue,
-                                           inifile=self.issues.inifile,
-                                           server=self.issues.server)
+                                           context=self.migration_context)
             if JIRA:
-                response = JIRA.mrate_issue()
+                response = JIRA.migrate_issue()
                 if response:
                     if 'previously' not in response:
                         print(f"Successfully submitted {JIRA.src.issue.key} to {JIRA.dst.issue.key}")
                         status = True
+                        self.changed()
                     else:
                         print(f'{response}')
                         status = True
@@ -513,6 +640,69 @@ class JiraShell(cmd.Cmd):
 
         return status
 
+    def do_stale(self, arg):
+        "Allow get, list and query to use the local mirror: stale [on|off]"
+        if arg.lower() == 'on':
+            if self.issues.mirror:
+                self.stale = True
+                print("Using local mirror where possible.")
+            else:
+                print("No mirror configured, set mirror_db in the ini file.")
+        elif arg.lower() == 'off':
+            self.stale = False
+            print("Using Jira for all requests.")
+        else:
+            print(f"Stale reads are {'on' if self.stale else 'off'}. Usage: stale [on|off]")
+        return
+
+
+    def do_mirror(self, arg):
+        "Manage the local mirror: mirror sync <PROJECT> [full] | mirror status"
+        parts = shlex.split(arg)
+        if not self.issues.mirror:
+            print("No mirror configured, set mirror_db in the ini file.")
+        elif len(parts) >= 2 and parts[0] == 'sync':
+            full = 'full' in parts[2:]
+            count = self.issues.sync_mirror(parts[1], full=full)
+            print(f"Synced {count} issues for {parts[1].upper()}")
+        elif parts and parts[0] == 'status':
+            for project, stats in self.issues.mirror.stats().items():
+                synced = 'never'
+                if stats.get('synced'):
+                    synced = time.strftime('%Y-%m-%d %H:%M:%S',
+                                           time.localtime(stats['synced']))
+                print(f"{project}: {stats['issues']} issues, last synced {synced}")
+        else:
+            print("Usage: mirror sync <PROJECT> [full] | mirror status")
+        return
+
+
+    def do_search(self, arg):
+        "Full text search of mirrored (or, without a mirror, Jira) issues: search <text> [limit=<n>]"
+        real_args, filename = self.parse_redirection(arg)
+        limit:int = 20
+        words:list = []
+
+        for part in shlex.split(real_args):
+            if part.startswith('limit='):
+                try:
+                    limit = int(part.split('=', 1)[1])
+                except ValueError:
+                    print(f"Invalid value '{part}', ignoring.")
+            else:
+                words.append(part)
+        if not words:
+            print("Usage: search <text> [limit=<n>]")
+            return
+
+        results = self.issues.search_text(' '.join(words), limit=limit)
+        for result in results:
+            self.write_output(f"{result['key']}: {result['summary']}",
+                              filename=filename)
+        self.write_output(f"Found {len(results)} issues", filename=filename)
+        return
+
+
     def do_quit(self, arg):
         "Exit the CLI"
         print("Goodbye!")
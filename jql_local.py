@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+#vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
+'''
+
+ Description:
+
+    Translate a practical subset of JQL to SQL for the local mirror
+
+    Supported:
+        field = value, field != value, field ~ text, field !~ text,
+        field in (a, b), field not in (a, b), field is [not] EMPTY,
+        date comparisons (>, >=, <, <=) on created and updated,
+        AND, OR, NOT, parentheses and ORDER BY
+
+    Anything else raises UnsupportedJQLError so that the caller can
+    fall back to the Jira server.
+
+ Requirements:
+   Python 3.8+
+
+ Author: Chris Marrison
+
+ Date Last Updated: 20261017
+
+ Todo:
+
+ Copyright (c) 2026 Chris Marrison / Infoblox
+
+ Redistribution and use in source and binary forms,
+ with or without modification, are permitted provided
+ that the following conditions are met:
+
+ 1. Redistributions of source code must retain the above copyright
+ notice, this list of conditions and the following disclaimer.
+
+ 2. Redistributions in binary form must reproduce the above copyright
+ notice, this list of conditions and the following disclaimer in the
+ documentation and/or other materials provided with the distribution.
+
+ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+ FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+ INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+ BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+ LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+ CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+ LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.
+
+'''
+__version__ = '0.0.1'
+__author__ = 'Chris Marrison'
+__author_email__ = 'chris@infoblox.com'
+
+
+import logging
+import re
+import datetime
+
+_logger = logging.getLogger(__name__)
+
+# JQL field name to mirror column(s)
+COLUMNS:dict = { 'key': [ 'key' ],
+                 'issuekey': [ 'key' ],
+                 'id': [ 'id' ],
+                 'project': [ 'project' ],
+                 'issuetype': [ 'issuetype' ],
+                 'type': [ 'issuetype' ],
+                 'status': [ 'status' ],
+                 'summary': [ 'summary' ],
+                 'reporter': [ 'reporter', 'reporter_id' ],
+                 'assignee': [ 'assignee', 'assignee_id' ],
+                 'created': [ 'created' ],
+                 'createddate': [ 'created' ],
+                 'updated': [ 'updated' ],
+                 'updateddate': [ 'updated' ] }
+
+DATE_FIELDS:list = [ 'created', 'updated' ]
+
+# Keys sort naturally by id within a project
+ORDER_COLUMNS:dict = { 'key': 'id',
+                       'issuekey': 'id',
+                       'id': 'id',
+                       'project': 'project',
+                       'issuetype': 'issuetype',
+                       'status': 'status',
+                       'summary': 'summary',
+                       'reporter': 'reporter',
+                       'assignee': 'assignee',
+                       'created': 'created',
+                       'updated': 'updated' }
+
+TOKEN_RE = re.compile(r'''\s*(?:
+                            "((?:[^"\\]|\\.)*)"        |  # double quoted
+                            '((?:[^'\\]|\\.)*)'        |  # single quoted
+                            (!=|!~|>=|<=|=|~|>|<)      |  # operators
+                            ([(),])                    |  # punctuation
+                            ([^\s,()=!~<>"']+)            # words
+                          )''', re.VERBOSE)
+
+
+class UnsupportedJQLError(Exception):
+    '''
+    Exception for JQL outside the locally supported subset
+    '''
+    pass
+
+
+def tokenise(query:str) -> list:
+    '''
+    Split query into (type, value) tokens
+
+    Raises:
+        UnsupportedJQLError
+    '''
+    tokens:list = []
+    pos:int = 0
+    query = query.rstrip()
+
+    while pos < len(query):
+        match = TOKEN_RE.match(query, pos)
+        if not match or match.end() == pos:
+            raise UnsupportedJQLError(f'Cannot parse JQL at: {query[pos:]}')
+        dquoted, squoted, op, punct, word = match.groups()
+        if dquoted is not None or squoted is not None:
+            value = dquoted if dquoted is not None else squoted
+            tokens.append(('string', re.sub(r'\\(.)', r'\1', value)))
+        elif op:
+            tokens.append(('op', op))
+        elif punct:
+            tokens.append(('punct', punct))
+        else:
+            tokens.append(('word', word))
+        pos = match.end()
+
+    return tokens
+
+
+class JQL_TRANSLATOR():
+    '''
+    Recursive descent parser producing a SQL WHERE clause, parameters
+    and ORDER BY clause over the mirror issues table
+    '''
+
+    def __init__(self, custom_fields:dict = {}):
+        '''
+        Initial Values
+
+        Parameters:
+            custom_fields:dict = JQL name or field id (lower case) to
+                                 the field name stored in issue_fields
+        '''
+        self.custom_fields:dict = { k.lower(): v for k, v in custom_fields.items() }
+        self.tokens:list = []
+        self.pos:int = 0
+        self.params:list = []
+        # Projects every match must belong to, None if unrestricted
+        self.projects:set = None
+
+        return
+
+
+    def translate(self, query:str) -> tuple:
+        '''
+        Translate JQL to SQL
+
+        Parameters:
+            query:str = JQL query
+
+        Returns:
+            tuple of (where:str, params:list, order:str)
+
+        Raises:
+            UnsupportedJQLError
+        '''
+        where:str = '1'
+        order:str = 'id DESC'
+
+        self.tokens = tokenise(query)
+        self.pos = 0
+        self.params = []
+        self.projects = None
+
+        if self.peek() and not self.is_keyword('order'):
+            where, self.projects = self.parse_or()
+        if self.is_keyword('order'):
+            self.next()
+            self.expect_keyword('by')
+            order = self.parse_order()
+        if self.peek():
+            raise UnsupportedJQLError(f'Unexpected {self.peek()[1]} in JQL')
+
+        _logger.debug(f'JQL {query} translated to: {where} ORDER BY {order}')
+
+        return where, self.params, order
+
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+
+    def next(self):
+        token = self.peek()
+        if not token:
+            raise UnsupportedJQLError('Unexpected end of JQL')
+        self.pos += 1
+        return token
+
+
+    def is_keyword(self, word:str) -> bool:
+        token = self.peek()
+        return bool(token and token[0] == 'word' and token[1].lower() == word)
+
+
+    def expect_keyword(self, word:str):
+        if not self.is_keyword(word):
+            raise UnsupportedJQLError(f'Expected {word.upper()} in JQL')
+        self.next()
+        return
+
+
+    # Each parse_ method returns (sql, projects) where projects is the
+    # set of projects the matches are restricted to, or None
+
+    def parse_or(self) -> tuple:
+        clauses = [ self.parse_and() ]
+        while self.is_keyword('or'):
+            self.next()
+            clauses.append(self.parse_and())
+        if len(clauses) == 1:
+            return clauses[0]
+        projects = None
+        if all(p is not None for _, p in clauses):
+            projects = set().union(*[ p for _, p in clauses ])
+        return '(' + ' OR '.join(c for c, _ in clauses) + ')', projects
+
+
+    def parse_and(self) -> tuple:
+        clauses = [ self.parse_not() ]
+        while self.is_keyword('and'):
+            self.next()
+            clauses.append(self.parse_not())
+        if len(clauses) == 1:
+            return clauses[0]
+        projects = None
+        for _, p in clauses:
+            if p is not None:
+                projects = set(p) if projects is None else projects & p
+        return '(' + ' AND '.join(c for c, _ in clauses) + ')', projects
+
+
+    def parse_not(self) -> tuple:
+        if self.is_keyword('not'):
+            self.next()
+            clause, _ = self.parse_not()
+            return f'NOT ({clause})', None
+        if self.peek() == ('punct', '('):
+            self.next()
+            clause = self.parse_or()
+            if self.next() != ('punct', ')'):
+                raise UnsupportedJQLError('Unbalanced parentheses in JQL')
+            return clause
+        return self.parse_clause()
+
+
+    def parse_clause(self) -> tuple:
+        '''
+        field operator value
+        '''
+        kind, field = self.next()
+        if kind not in [ 'word', 'string' ]:
+            raise UnsupportedJQLError(f'Expected field name, found {field}')
+        field = field.lower()
+
+        if self.is_keyword('is'):
+            self.next()
+            negate = self.is_keyword('not')
+            if negate:
+                self.next()
+            if not (self.is_keyword('empty') or self.is_keyword('null')):
+                raise UnsupportedJQLError('Only EMPTY/NULL supported after IS')
+            self.next()
+            return self.empty_clause(field, negate), None
+
+        if self.is_keyword('in') or self.is_keyword('not'):
+            negate = self.is_keyword('not')
+            if negate:
+                self.next()
+            self.expect_keyword('in')
+            op = '!=' if negate else '='
+            values = self.parse_list()
+        else:
+            kind, op = self.next()
+            if kind != 'op':
+                raise UnsupportedJQLError(f'Unsupported operator {op}')
+            values = [ self.parse_value() ]
+
+        projects = None
+        if field == 'project' and op == '=':
+            projects = { v.upper() for v in values }
+
+        return self.compare(field, op, values), projects
+
+
+    def parse_list(self) -> list:
+        values:list = []
+        if self.next() != ('punct', '('):
+            raise UnsupportedJQLError('Expected ( after IN')
+        while True:
+            values.append(self.parse_value())
+            token = self.next()
+            if token == ('punct', ')'):
+                break
+            if token != ('punct', ','):
+                raise UnsupportedJQLError('Expected , or ) in list')
+        return values
+
+
+    def parse_value(self) -> str:
+        kind, value = self.next()
+        if kind not in [ 'word', 'string' ]:
+            raise UnsupportedJQLError(f'Unexpected {value} in JQL')
+        if kind == 'word' and self.peek() == ('punct', '('):
+            # Functions such as currentUser() need the server
+            raise UnsupportedJQLError(f'JQL function {value}() not supported')
+        return value
+
+
+    def empty_clause(self, field:str, negate:bool) -> str:
+        if field in COLUMNS:
+            checks = [ f"IFNULL({c}, '') = ''" for c in COLUMNS[field][:1] ]
+            clause = checks[0]
+        else:
+            name = self.custom_field(field)
+            self.params.append(name)
+            clause = ('NOT EXISTS (SELECT 1 FROM issue_fields f WHERE '
+                      "f.key = issues.key AND f.field = ? AND IFNULL(f.value, '') != '')")
+        return f'NOT ({clause})' if negate else clause
+
+
+    def compare(self, field:str, op:str, values:list) -> str:
+        '''
+        Build the SQL for a comparison of field with one or more values
+        '''
+        if COLUMNS.get(field, [ None ])[0] in DATE_FIELDS:
+            return self.compare_date(COLUMNS[field][0], op, values)
+
+        if op in [ '>', '>=', '<', '<=' ]:
+            raise UnsupportedJQLError(f'{op} only supported for dates')
+
+        # Negations hold when none of the values match
+        negate = op in [ '!=', '!~' ]
+        positive_op = { '!=': '=', '!~': '~' }.get(op, op)
+
+        if field in COLUMNS:
+            columns = COLUMNS[field]
+            matches = []
+            for value in values:
+                for column in columns:
+                    matches.append(self.match(column, positive_op, value))
+            clause = '(' + ' OR '.join(matches) + ')'
+            if negate:
+                # As in JQL, issues without a value never match !=
+                clause = f"(IFNULL({columns[0]}, '') != '' AND NOT {clause})"
+        else:
+            name = self.custom_field(field)
+            matches = []
+            self.params.append(name)
+            for value in values:
+                matches.append(self.match('f.value', positive_op, value))
+            clause = ('EXISTS (SELECT 1 FROM issue_fields f WHERE f.key = issues.key '
+                      'AND f.field = ? AND (' + ' OR '.join(matches) + '))')
+            if negate:
+                clause = f'NOT {clause}'
+
+        return clause
+
+
+    def match(self, column:str, op:str, value:str) -> str:
+        if op == '~':
+            self.params.append(f'%{value}%')
+            return f'{column} LIKE ?'
+        elif op == '=':
+            self.params.append(value)
+            if column == 'id':
+                return f'CAST({column} AS TEXT) = ?'
+            return f'{column} = ? COLLATE NOCASE'
+        raise UnsupportedJQLError(f'Unsupported operator {op}')
+
+
+    def compare_date(self, column:str, op:str, values:list) -> str:
+        if op not in [ '>', '>=', '<', '<=', '=' ] or len(values) != 1:
+            raise UnsupportedJQLError(f'Unsupported date comparison {op}')
+        date = jql_datetime(values[0])
+        if op == '=':
+            # The whole day in local time, bounded in UTC
+            start = date.astimezone().replace(hour=0, minute=0, second=0, microsecond=0)
+            end = start + datetime.timedelta(days=1)
+            self.params.extend([ utc_string(start), utc_string(end) ])
+            return f'({column} >= ? AND {column} < ?)'
+        self.params.append(utc_string(date))
+        return f'{column} {op} ?'
+
+
+    def custom_field(self, field:str) -> str:
+        match = re.fullmatch(r'cf\[(\d+)\]', field)
+        if match:
+            field = f'customfield_{match.group(1)}'
+        name = self.custom_fields.get(field)
+        if not name:
+            raise UnsupportedJQLError(f'Field {field} is not mirrored')
+        return name
+
+
+    def parse_order(self) -> str:
+        items:list = []
+        while True:
+            kind, field = self.next()
+            column = ORDER_COLUMNS.get(field.lower())
+            if not column:
+                raise UnsupportedJQLError(f'Cannot order by {field} locally')
+            direction = 'ASC'
+            if self.is_keyword('asc') or self.is_keyword('desc'):
+                direction = self.next()[1].upper()
+            items.append(f'{column} {direction}')
+            if self.peek() == ('punct', ','):
+                self.next()
+            else:
+                break
+        return ', '.join(items)
+
+
+def utc_string(date:datetime.datetime) -> str:
+    '''
+    Aware datetime as a UTC string comparable with the timestamps stored
+    in the mirror, see mirror.utc_timestamp()
+    '''
+    return date.astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M')
+
+
+def parse_jql_date(value:str) -> str:
+    '''
+    Convert a JQL date to a UTC ISO string comparable with the
+    timestamps stored in the mirror, see jql_datetime()
+
+    Raises:
+        UnsupportedJQLError
+    '''
+    return utc_string(jql_datetime(value))
+
+
+def jql_datetime(value:str) -> datetime.datetime:
+    '''
+    Convert a JQL date ("2024-05-29", "2024/05/29 10:00" or relative
+    "-7d", "-2w", "-4h", "-30m") to an aware datetime. Jira reads
+    absolute dates in the user's time zone, taken here as the local
+    time zone
+
+    Raises:
+        UnsupportedJQLError
+    '''
+    value = value.strip()
+    relative = re.fullmatch(r'([-+]?)(\d+)([wdhm])', value)
+    if relative:
+        sign, amount, unit = relative.groups()
+        delta = datetime.timedelta(**{ { 'w': 'weeks', 'd': 'days',
+                                          'h': 'hours', 'm': 'minutes' }[unit]:
+                                        int(amount) })
+        date = datetime.datetime.now(datetime.timezone.utc)
+        return date - delta if sign != '+' else date + delta
+
+    for fmt in [ '%Y-%m-%d %H:%M', '%Y/%m/%d %H:%M', '%Y-%m-%d', '%Y/%m/%d' ]:
+        try:
+            return datetime.datetime.strptime(value, fmt).astimezone()
+        except ValueError:
+            pass
+
+    raise UnsupportedJQLError(f'Unsupported date {value}')
+
+
+def translate(query:str, custom_fields:dict = {}) -> tuple:
+    '''
+    Translate JQL to a (where, params, order) SQL tuple
+
+    Raises:
+        UnsupportedJQLError
+    '''
+    return JQL_TRANSLATOR(custom_fields=custom_fields).translate(query)
+
+
+def single_project(query:str) -> str:
+    '''
+    Project a query is restricted to by a single top level
+    "project = X" clause joined to the rest with AND
+
+    Returns:
+        Project or '' if the query may span projects or cannot be parsed
+    '''
+    project:str = ''
+    depth:int = 0
+
+    try:
+        tokens = tokenise(query)
+    except UnsupportedJQLError:
+        return ''
+
+    for n, (kind, value) in enumerate(tokens):
+        word = value.lower() if kind == 'word' else ''
+        if kind == 'punct' and value in '()':
+            depth += 1 if value == '(' else -1
+        elif word == 'order':
+            break
+        elif word == 'or':
+            return ''
+        elif word == 'project' and n + 1 < len(tokens) and tokens[n + 1][0] == 'op':
+            negated = n > 0 and tokens[n - 1][0] == 'word' and \
+                      tokens[n - 1][1].lower() == 'not'
+            if (project or depth or negated or tokens[n + 1][1] != '=' or
+                    n + 2 >= len(tokens) or tokens[n + 2][0] not in ('word', 'string')):
+                return ''
+            project = tokens[n + 2][1].upper()
+        elif word == 'project':
+            # project in (...), project was ... and the like
+            return ''
+
+    return project
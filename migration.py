@@ -11,7 +11,7 @@
 
  Author: Chris Marrison
 
- Date Last Updated: 20241127
+ Date Last Updated: 20261017
 
  Todo:
 
@@ -42,18 +42,456 @@
  POSSIBILITY OF SUCH DAMAGE.
 
 '''
-__version__ = '0.2.1'
+__version__ = '0.2.2'
 __author__ = 'Chris Marrison'
 __author_email__ = 'chris@infoblox.com'
 
 
 import logging
+import os
+import json
+import queue
+import collections
+import concurrent.futures
+import sqlite3
+import threading
+import time
+import requests
 import issues
+import cache
 import jira
 import jira.exceptions
 
 _logger = logging.getLogger(__name__)
 
+DEFAULT_INDEX:str = os.path.join(cache.DEFAULT_CACHE_DIR, 'migration_index.db')
+
+# Default remapping tables, override or extend with a JSON mapping file
+DEFAULT_MAPPINGS:dict = {
+    # Source field name -> source field holding the value to migrate
+    'fields': {
+                # 'Product': 'Product (migrated)',
+                'Product Family': 'Product (migrated)',
+                'Support Cases': 'Support Cases (migrated)',
+                'Prospects/Customers': 'Prospects/Customers (migrated)'
+              },
+    # Source option value -> destination option value
+    'options': {
+                 "ActiveTrust Cloud": "BloxOne TD"
+                 # "BloxOne DDI": "UDDI",
+                 # "BloxOne TD": "Infoblox Threat Defense",
+                 # "Network Insight": "NIOS"
+               },
+    # Source component -> destination component
+    'components': {},
+    # Source version -> destination version
+    'versions': {}
+}
+
+
+def load_mappings(filename:str = '') -> dict:
+    '''
+    Load remapping tables, entries in filename are merged over the
+    defaults for each of 'fields', 'options', 'components' and 'versions'
+
+    Parameters:
+        filename:str = JSON mapping file
+
+    Returns:
+        dict of mapping tables
+    '''
+    mappings:dict = { k: dict(v) for k, v in DEFAULT_MAPPINGS.items() }
+
+    if filename:
+        with open(filename) as f:
+            data = json.load(f)
+        for table, entries in data.items():
+            if table in mappings and isinstance(entries, dict):
+                mappings[table].update(entries)
+            else:
+                _logger.warning(f'Ignoring unknown mapping table {table}')
+        _logger.info(f'Loaded mappings from {filename}')
+
+    return mappings
+
+
+class MIGRATION_INDEX():
+    '''
+    Persistent RFE -> IFR mapping built from the 'RFE #' field of the
+    destination project, so migration checks need no per issue search
+    '''
+
+    def __init__(self, filename:str = DEFAULT_INDEX):
+        '''
+        Initial Values
+
+        Parameters:
+            filename:str = SQLite database file
+        '''
+        self.filename:str = os.path.abspath(os.path.expanduser(filename))
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        self.db = sqlite3.connect(self.filename, check_same_thread=False)
+        with self._lock, self.db:
+            self.db.execute('''CREATE TABLE IF NOT EXISTS rfe_map (
+                                   rfe TEXT PRIMARY KEY,
+                                   issue TEXT,
+                                   project TEXT,
+                                   recorded REAL)''')
+            self.db.execute('''CREATE TABLE IF NOT EXISTS sweeps (
+                                   project TEXT PRIMARY KEY,
+                                   swept REAL)''')
+
+        return
+
+
+    def sweep(self,
+              dst:issues.ISSUES,
+              project:str = 'IFR',
+              field:str = 'RFE #') -> int:
+        '''
+        Rebuild the mapping for project from one pass over its issues,
+        the stored mappings are only replaced once the pass completes.
+        A failed pass marks the project unswept so that lookups fall
+        back to searching Jira, see swept()
+
+        Parameters:
+            dst:issues.ISSUES = ISSUES object for the destination
+            project:str = Destination project
+            field:str = Field holding the source issue key
+
+        Returns:
+            Number of mappings found
+        '''
+        count:int = 0
+        mappings:dict = {}
+        field_id = dst.get_field_id(field)
+        query = f'project = "{project}" AND "{field}[Short text]" is not EMPTY'
+
+        if not field_id:
+            _logger.error(f'Failed to build migration index: field {field} not found')
+            self.invalidate(project)
+            return count
+
+        try:
+            # Oldest first, so the first migration of an RFE wins and new
+            # issues land after the pages already read. Offset paging, as
+            # keyset paging is not yet proven against Jira
+            for issue in dst.iter_jql(f'{query} ORDER BY created ASC, key ASC',
+                                      fields=[ field_id ]):
+                rfe = getattr(issue.fields, field_id, None)
+                if rfe:
+                    rfe = str(rfe).strip().upper()
+                    if rfe in mappings:
+                        _logger.warning(f'{rfe} migrated more than once: ' +
+                                        f'{mappings[rfe]}, {issue.key}')
+                    else:
+                        mappings[rfe] = issue.key
+        except jira.exceptions.JIRAError as Err:
+            _logger.error(f'Failed to build migration index: {Err}')
+            self.invalidate(project)
+            return count
+
+        with self._lock, self.db:
+            self.db.execute('DELETE FROM rfe_map WHERE project = ?', (project,))
+            self.db.executemany('INSERT OR REPLACE INTO rfe_map VALUES (?, ?, ?, ?)',
+                                [ (rfe, key, project, time.time())
+                                  for rfe, key in mappings.items() ])
+            self.db.execute('INSERT OR REPLACE INTO sweeps VALUES (?, ?)',
+                            (project, time.time()))
+        count = len(mappings)
+        _logger.info(f'Migration index: {count} issues migrated to {project}')
+
+        return count
+
+
+    def invalidate(self, project:str = 'IFR'):
+        '''
+        Mark project as not swept, its mappings are kept but no longer
+        trusted to be complete
+        '''
+        with self._lock, self.db:
+            self.db.execute('DELETE FROM sweeps WHERE project = ?', (project,))
+
+        return
+
+
+    def swept(self, project:str = 'IFR', max_age:float = 0) -> bool:
+        '''
+        Whether project has a complete sweep, no older than max_age
+        seconds when max_age is set
+
+        Returns:
+            bool, if False a missing mapping does not mean the issue
+            has not been migrated
+        '''
+        with self._lock:
+            row = self.db.execute('SELECT swept FROM sweeps WHERE project = ?',
+                                  (project,)).fetchone()
+
+        if not row:
+            return False
+
+        return max_age <= 0 or time.time() - row[0] <= max_age
+
+
+    def get(self, rfe:str) -> str:
+        '''
+        Destination issue for rfe
+
+        Returns:
+            Issue key or '' if not migrated
+        '''
+        with self._lock:
+            row = self.db.execute('SELECT issue FROM rfe_map WHERE rfe = ?',
+                                  (rfe.strip().upper(),)).fetchone()
+
+        return row[0] if row else ''
+
+
+    def add(self, rfe:str, issue:str, project:str = 'IFR'):
+        '''
+        Record a newly migrated issue
+        '''
+        with self._lock, self.db:
+            self.db.execute('INSERT OR REPLACE INTO rfe_map VALUES (?, ?, ?, ?)',
+                            (rfe.strip().upper(), issue, project, time.time()))
+
+        return
+
+
+    def items(self, project:str = 'IFR') -> list:
+        '''
+        All (rfe, issue) mappings for project
+        '''
+        with self._lock:
+            rows = self.db.execute('SELECT rfe, issue FROM rfe_map ' +
+                                   'WHERE project = ? ORDER BY rfe',
+                                   (project,)).fetchall()
+
+        return rows
+
+
+class MIGRATION_JOURNAL():
+    '''
+    Append-only JSONL journal of migration stage outcomes, one line
+    per completed step, used to resume an interrupted bulk migration
+    '''
+
+    def __init__(self, filename:str):
+        '''
+        Initial Values
+
+        Parameters:
+            filename:str = Journal file
+        '''
+        self.filename:str = filename
+        self._lock = threading.Lock()
+
+        # Terminate a line torn by an interrupted write so that new
+        # entries are not appended to it
+        try:
+            with open(self.filename, 'rb+') as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell():
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        f.write(b'\n')
+        except FileNotFoundError:
+            pass
+
+        return
+
+
+    def record(self, issue:str, step:str, **data):
+        '''
+        Append a completed step for issue, e.g. record(rfe, 'created', key=ifr)
+        '''
+        entry:dict = { 'issue': issue, 'step': step, 'time': time.time() }
+        entry.update(data)
+
+        with self._lock:
+            with open(self.filename, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+        return
+
+
+    def load(self) -> dict:
+        '''
+        Fold the journal into the state of each issue
+
+        Returns:
+            dict of issue: { 'created': key, 'steps': set,
+                             'comments': set, 'attachments': set }
+        '''
+        state:dict = {}
+
+        try:
+            with open(self.filename) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Partial line from an interrupted write
+                        _logger.warning(f'Ignoring journal line: {line.strip()}')
+                        continue
+                    issue = state.setdefault(entry['issue'],
+                                             { 'created': '',
+                                               'steps': set(),
+                                               'comments': set(),
+                                               'attachments': set() })
+                    if entry['step'] == 'created':
+                        issue['created'] = entry.get('key', '')
+                    elif entry['step'] == 'comment':
+                        issue['comments'].add(entry.get('id'))
+                    elif entry['step'] == 'attachment':
+                        issue['attachments'].add(entry.get('id'))
+                    issue['steps'].add(entry['step'])
+        except FileNotFoundError:
+            _logger.info(f'No journal {self.filename}, starting afresh')
+
+        return state
+
+
+def allowed_values(fields:dict, field:str) -> frozenset:
+    '''
+    Names of the allowed values of field in a createmeta field dict
+
+    Parameters:
+        fields:dict = Fields from ISSUES.get_issue_fields()
+        field:str = Field name, e.g. 'versions'
+
+    Returns:
+        frozenset of allowed value names
+    '''
+    allowed:set = set()
+
+    if fields.get(field):
+        values = fields.get(field).get('allowedValues')
+        if values:
+            for value in values:
+                allowed.add(value.get('name'))
+
+    return frozenset(allowed)
+
+
+class MIGRATION_CONTEXT():
+    '''
+    State shared by every issue in a migration run, the session, field
+    catalog, destination schema and allowed values are loaded once and
+    borrowed by each MIGRATE_ISSUE
+    '''
+
+    def __init__(self,
+                 dst_project:str = 'IFR',
+                 inifile:str = 'jira.ini',
+                 server:str = 'https://infoblox.atlassian.net',
+                 index:MIGRATION_INDEX = None,
+                 jira_issues:issues.ISSUES = None,
+                 mappings:str = '',
+                 transfers:int = 2):
+        '''
+        Initialise class
+
+        Parameters:
+            dst_project: str = Destination project
+            inifile: str = Inifile containing jira api configuration
+            server: str = URL of Jira cloud instance
+            index: MIGRATION_INDEX = Swept RFE -> IFR mappings
+            jira_issues: issues.ISSUES = Existing session to borrow
+            mappings: str = JSON file of additional remappings
+            transfers: int = Maximum concurrent attachment transfers
+                             across the whole run
+        '''
+        if jira_issues:
+            self.jira_issues = jira_issues.clone()
+        else:
+            self.jira_issues = issues.ISSUES(inifile=inifile, server=server)
+        self.dst_project = dst_project
+        self.index = index
+        self.issue_fields = self.jira_issues.get_issue_fields(project=dst_project)
+        self.required_fields = self.jira_issues.get_issue_fields(project=dst_project,
+                                                                 required=True)
+        # Field ids that can be set on the destination create screen
+        self.schema = self.jira_issues.get_schema(project=dst_project)
+        self.create_fields = frozenset(self.schema.keys())
+        self.allowed_by_field = self.compile_allowed_values()
+        self.allowed_versions = allowed_values(self.required_fields, 'versions')
+        self.allowed_components = allowed_values(self.required_fields, 'components')
+        self.mappings = load_mappings(mappings)
+        self.option_map = self.mappings['options']
+        self.component_map = self.mappings['components']
+        self.version_map = self.mappings['versions']
+        self.field_remap = self.compile_field_remap()
+        self.transfers:int = max(1, transfers)
+        self.transfer_slots = threading.BoundedSemaphore(self.transfers)
+
+        return
+
+
+    def compile_allowed_values(self) -> dict:
+        '''
+        Allowed ids, keys, names and values of each create screen field
+        that restricts its values
+
+        Returns:
+            dict of field id: frozenset
+        '''
+        allowed:dict = {}
+
+        for field_id, meta in self.schema.items():
+            values = meta.get('allowedValues')
+            if values:
+                allowed[field_id] = frozenset(str(v[k]) for v in values
+                                              for k in ('id', 'key', 'name', 'value')
+                                              if k in v)
+
+        return allowed
+
+
+    def compile_field_remap(self) -> dict:
+        '''
+        Resolve the field mappings to source field ids once, keyed
+        by both field name and field id
+
+        Returns:
+            dict of field name or id -> field id holding the value
+        '''
+        remap:dict = {}
+        field_map = self.jira_issues.field_map
+
+        for name, alternate in self.mappings['fields'].items():
+            alt_id = field_map.get(alternate)
+            if not alt_id:
+                _logger.warning(f'Mapped field {alternate} not found')
+                continue
+            remap[name] = alt_id
+            field_id = field_map.get(name)
+            if field_id:
+                remap[field_id] = alt_id
+
+        return remap
+
+
+    def build_index(self, field:str = 'RFE #') -> int:
+        '''
+        Create and sweep the migration index for the destination project
+
+        Returns:
+            Number of issues previously migrated
+        '''
+        if not self.index:
+            self.index = MIGRATION_INDEX()
+
+        return self.index.sweep(self.jira_issues,
+                                project=self.dst_project,
+                                field=field)
+
+
 class MIGRATE_ISSUE():
     '''
     Note this returns an assertion error if the source issue is not found
@@ -63,7 +501,11 @@ class MIGRATE_ISSUE():
                  issue:str,
                  dst_project:str = 'IFR', 
                  inifile:str = 'jira.ini',
-                 server:str = 'https://infoblox.atlassian.net'):
+                 server:str = 'https://infoblox.atlassian.net',
+                 index:MIGRATION_INDEX = None,
+                 context:MIGRATION_CONTEXT = None,
+                 source:object = None,
+                 planned:dict = None):
         '''
         Initialise class
 
@@ -72,16 +514,60 @@ class MIGRATE_ISSUE():
             dst_project: str = Destination project
             inifile: str = Inifile containing jira api configuration
             server: str = URL of Jira cloud instance
+            index: MIGRATION_INDEX = Swept RFE -> IFR mappings used
+                                     instead of a search per issue
+            context: MIGRATION_CONTEXT = Shared run state, when supplied
+                                         dst_project, inifile and server
+                                         are taken from it
+            source: object = Source jira issue already retrieved
+            planned: dict = Plan entry from MIGRATION_PLAN, the source
+                            issue is not retrieved
         '''
-        self.src = issues.ISSUES(inifile=inifile, server=server)
-        if not self.src.get_issue(issue):
-            assert self.src.issue
-        self.dst = issues.ISSUES(inifile=inifile, server=server)
-        self.dst_project = dst_project
-        # self.required_fields = self.dst.get_required_fields(self.dst_project)
-        self.issue_fields = self.dst.get_issue_fields()
-        self.required_fields = self.dst.get_issue_fields(required=True)
-        self.allowed_components = self.get_allowed_components()
+        if not context:
+            context = MIGRATION_CONTEXT(dst_project=dst_project,
+                                        inifile=inifile,
+                                        server=server,
+                                        index=index)
+        self.context = context
+        self.index = index or context.index
+        # Key as supplied, and the current source key once retrieved,
+        # which differs for moved issues
+        self.requested:str = issue.strip().upper()
+        self.key:str = self.requested
+        self.src = context.jira_issues.clone()
+        if source:
+            self.src.issue = source
+        elif not planned:
+            if not self.src.get_issue(issue):
+                assert self.src.issue
+        if self.src.issue:
+            self.key = self.src.issue.key
+        self.dst = context.jira_issues.clone()
+        self.dst_project = context.dst_project
+        self.issue_fields = context.issue_fields
+        self.required_fields = context.required_fields
+        self.allowed_components = context.allowed_components
+        # Stage state, see plan(), create() and enrich()
+        self.migrated_as:str = ''
+        self.issue_dict:dict = {}
+        self.follow_up:dict = {}
+        # Journal and steps already completed when resuming
+        self.journal:MIGRATION_JOURNAL = None
+        self.completed:set = set()
+        self.copied_comments:set = set()
+        self.copied_attachments:set = set()
+        # Origin comment, source comments and attachments, preloaded
+        # from a plan
+        self.planned:bool = bool(planned)
+        self.origin:str = ''
+        self.comments:list = None
+        self.attachments:list = None
+        if planned:
+            self.issue_dict = planned['issue_dict']
+            self.follow_up = planned.get('follow_up', {})
+            self.origin = planned.get('origin', '')
+            self.comments = planned.get('comments', [])
+            self.attachments = planned.get('attachments', [])
 
         return
         
@@ -89,7 +575,8 @@ class MIGRATE_ISSUE():
     def migrate_issue(self, 
                       include_comments:bool = True,
                       additional_fields:list = ['Support Cases',
-                                                'Prospects/Customers' ]):
+                                                'Prospects/Customers' ],
+                      include_attachments:bool = True):
         '''
         Migrate source Issue to destination Issue
 
@@ -97,79 +584,306 @@ class MIGRATE_ISSUE():
             Issue key or None
         '''
         status:str
-        summary:str
-        description:str
-        project:str
-        components:list
-        custom_fields:dict
-
-        migrated = self.migrated()
-
-        if not migrated:
-            summary = self.src.issue.fields.summary
-            description = self.normalise_string(self.src.issue.fields.description)
-            project = self.dst_project
-            versions = self.get_versions()
-            
-            # Create components list
-            components = self.build_components()
-
-            # Build basic dictionary of minimum fields
-            issue_dict = {
-                            "issuetype": { "name": "New Feature" },
-                            "summary": summary,
-                            "description": description,
-                            "project": { "key": project },
-                            "versions": versions,
-                            "components": components
-                        }
-
-            # Handle Custom Fields
-            custom_fields = self.build_custom_fields()
-            issue_dict.update(custom_fields)
-
-            _logger.debug(f'Issue Dictionary: {issue_dict}')
 
+        if self.plan(additional_fields=additional_fields):
             # Create Destination Issue
-            if self.dst.create_issue(issue_dict=issue_dict):
+            if self.create():
                 # status = self.dst.issue.key
                 status = f'{self.src.issue.key} submitted as: {self.dst.issue.key}'
-                # Add Origin Information as a comment
-                if self.add_origin_data():
-                    _logger.info('Origin data added')
-                else:
-                    _logger.error('Origin data not added')
-                # Check whether we copy existing comments from source issue
-                if include_comments:
-                    self.copy_comments()
-                if additional_fields:
-                    if self.add_additional_fields(fieldlist=additional_fields):
-                        _logger.info(f'Successfully added: {additional_fields}')
-                    else:
-                        _logger.error(f'Failed to add: {additional_fields}')
+                self.enrich(include_comments=include_comments,
+                            include_attachments=include_attachments)
             else:
                 status = f'Error creating IFR from {self.src.issue.key}'
         else:
+            # status = f'Previously migrated as: {self.migrated_as}'
+            status = f'{self.src.issue.key} previously migrated as: {self.migrated_as}'
+
+        return status
+
+
+    def plan(self,
+             additional_fields:list = ['Support Cases',
+                                       'Prospects/Customers' ]) -> bool:
+        '''
+        Check whether the source issue was previously migrated and
+        build the create payload
+
+        Returns:
+            bool indicating the issue should be created
+        '''
+        self.migrated_as = self.migrated(project=self.dst_project)
+
+        if self.migrated_as:
             _logger.warning(f'Previously migrated')
-            # status = f'Previously migrated as: {migrated}'
-            status = f'{self.src.issue.key} previously migrated as: {migrated}'
+            return False
+
+        self.issue_dict, self.follow_up = self.build_issue_dict(additional_fields)
+        _logger.debug(f'Issue Dictionary: {self.issue_dict}')
+
+        return True
+
+
+    def create(self) -> bool:
+        '''
+        Create the destination issue from the planned payload
+
+        Returns:
+            bool indicating success
+        '''
+        created = self.dst.create_issue(issue_dict=self.issue_dict)
+        if not created and 'reporter' in self.issue_dict:
+            # Reporter may no longer be assignable, create without it and
+            # try setting it again with the follow up fields in enrich()
+            reporter = self.issue_dict.pop('reporter')
+            _logger.warning(f'{self.key}: create failed, retrying without ' +
+                            f'reporter {reporter.get("accountId")}')
+            created = self.dst.create_issue(issue_dict=self.issue_dict)
+            if created:
+                self.follow_up['reporter'] = reporter
+
+        if created:
+            self.journal_step('created', key=self.dst.issue.key)
+            if self.index:
+                self.index.add(self.key, self.dst.issue.key,
+                               project=self.dst_project)
+
+        return created
+
+
+    def resume(self,
+               state:dict,
+               additional_fields:list = ['Support Cases',
+                                         'Prospects/Customers' ]) -> bool:
+        '''
+        Continue a partially migrated issue from its journal state,
+        loading the destination issue created by the earlier run
+
+        Parameters:
+            state:dict = Issue state from MIGRATION_JOURNAL.load()
+            additional_fields:list = Additional field names to copy
+
+        Returns:
+            bool indicating the destination issue was found
+        '''
+        if not self.dst.get_issue(state['created'], fields=['key']):
+            _logger.error(f'Journalled issue {state["created"]} not found')
+            return False
+
+        self.completed = set(state['steps'])
+        self.copied_comments = set(state['comments'])
+        self.copied_attachments = set(state.get('attachments', ()))
+        if 'fields' not in self.completed and not self.planned:
+            self.issue_dict, self.follow_up = self.build_issue_dict(additional_fields)
+
+        return True
+
+
+    def journal_step(self, step:str, **data):
+        '''
+        Record a completed step when journalling
+        '''
+        if self.journal:
+            self.journal.record(self.requested, step, **data)
+
+        return
+
+
+    def enrich(self,
+               include_comments:bool = True,
+               include_attachments:bool = True) -> bool:
+        '''
+        Apply what could not be set on create: fields missing from the
+        create screen, the origin comment, the source comments and the
+        source attachments
+
+        Returns:
+            bool indicating the fields and origin comment were added
+        '''
+        status:bool = True
+
+        # Fields not available on the create screen
+        if self.follow_up and 'fields' not in self.completed:
+            if self.update_fields(self.follow_up):
+                _logger.info(f'Successfully added: {list(self.follow_up)}')
+                self.journal_step('fields')
+            else:
+                _logger.error(f'Failed to add: {list(self.follow_up)}')
+                status = False
+        # Add Origin Information as a comment
+        if 'origin' not in self.completed:
+            if self.dst.add_comment(comment=self.origin or self.origin_comment()):
+                _logger.info('Origin data added')
+                self.journal_step('origin')
+            else:
+                _logger.error('Origin data not added')
+                status = False
+        # Check whether we copy existing comments from source issue
+        if include_comments and 'comments' not in self.completed:
+            if self.copy_comments():
+                self.journal_step('comments')
+            else:
+                status = False
+        if include_attachments and 'attachments' not in self.completed:
+            if self.copy_attachments():
+                self.journal_step('attachments')
+            else:
+                status = False
+
+        if status:
+            self.journal_step('done', key=self.dst.issue.key)
+
+        return status
+
+
+    def build_issue_dict(self,
+                         additional_fields:list = [],
+                         custom_field:str = 'RFE #') -> tuple:
+        '''
+        Build the complete create payload, including the origin RFE,
+        reporter and additional fields, so that the destination issue
+        is populated by a single create call
+
+        Parameters:
+            additional_fields:list = Additional field names to copy
+            custom_field:str = Field recording the source issue
+
+        Returns:
+            tuple of (issue_dict, follow_up) where follow_up holds the
+            fields the create screen does not allow, keyed by field id
+        '''
+        fields:dict = {}
+        follow_up:dict = {}
+
+        # Build basic dictionary of minimum fields
+        issue_dict:dict = {
+                        "issuetype": { "name": "New Feature" },
+                        "summary": self.src.issue.fields.summary,
+                        "description": self.normalise_string(self.src.issue.fields.description),
+                        "project": { "key": self.dst_project },
+                        "versions": self.get_versions(),
+                        "components": self.build_components()
+                    }
+
+        # Handle Custom Fields
+        issue_dict.update(self.build_custom_fields())
+
+        rfe_field = self.dst.field_map.get(custom_field)
+        if rfe_field:
+            fields[rfe_field] = self.src.issue.key
+        else:
+            _logger.error(f'Field {custom_field} not found')
+
+        accountId = getattr(self.src.issue.fields.reporter, 'accountId', '')
+        if accountId:
+            fields['reporter'] = { 'accountId': accountId }
+
+        for f in additional_fields:
+            field_id = self.dst.field_map.get(f)
+            if field_id:
+                fields.update(self.process_custom_field(field_id))
+            else:
+                _logger.error(f'Additional field {f} not found')
+
+        for field_id, value in fields.items():
+            if field_id in self.context.create_fields:
+                issue_dict[field_id] = value
+            else:
+                follow_up[field_id] = value
+
+        return issue_dict, follow_up
+
+
+    def validate(self) -> list:
+        '''
+        Check the planned payload against the destination createmeta,
+        required fields must be present and restricted fields must use
+        allowed values
+
+        Returns:
+            list of problems, empty if the payload is valid
+        '''
+        errors:list = []
+
+        for field_id, meta in self.context.schema.items():
+            if meta.get('required') and not meta.get('hasDefaultValue'):
+                if self.issue_dict.get(field_id) in (None, '', []):
+                    errors.append(f'Required field {meta.get("name", field_id)} missing')
+
+        for field_id, value in self.issue_dict.items():
+            allowed = self.context.allowed_by_field.get(field_id)
+            if not allowed:
+                continue
+            for v in value if isinstance(value, list) else [ value ]:
+                if isinstance(v, dict):
+                    candidates = [ str(v[k]) for k in ('id', 'key', 'name', 'value')
+                                   if k in v ]
+                    if candidates and not allowed.intersection(candidates):
+                        name = self.context.schema[field_id].get('name', field_id)
+                        errors.append(f'{name}: {candidates[0]} not allowed')
+
+        return errors
+
+
+    def plan_entry(self) -> dict:
+        '''
+        Planned migration as a JSON serialisable dict, including the
+        origin comment and source comments so execution needs no reads
+
+        Returns:
+            dict for MIGRATION_PLAN
+        '''
+        return { 'issue': self.key,
+                 'issue_dict': self.issue_dict,
+                 'follow_up': self.follow_up,
+                 'origin': self.origin_comment(),
+                 'comments': self.source_comments(),
+                 'attachments': self.source_attachments() }
+
+
+    def update_fields(self, fields:dict) -> bool:
+        '''
+        Update the destination issue with fields in a single call
+        '''
+        status:bool = False
+
+        try:
+            self.dst.issue.update(fields=fields)
+            status = True
+        except jira.exceptions.JIRAError as err:
+            _logger.error(f'Updating fields {list(fields)} failed: {err}')
+            status = False
 
         return status
 
 
     def migrated(self, project:str = 'IFR'):
         '''
+        Check whether the source issue has been migrated, using the
+        migration index when available and searching Jira when the
+        index has no complete sweep of project
+
+        Returns:
+            Destination issue key or ''
         '''
         status:str = ''
 
-        jql_query = f'"RFE #[Short text]" ~ "{self.src.issue.key}" AND project = "{project}"'
+        if self.index:
+            status = self.index.get(self.key)
+            if status:
+                _logger.warning(f'{self.key} already migrated as {status}')
+                return status
+            if self.index.swept(project):
+                return status
+            _logger.info(f'Migration index not swept for {project}, searching')
+
+        jql_query = f'"RFE #[Short text]" ~ "{self.key}" AND project = "{project}"'
 
         try:
             issues = self.dst.jira_session.search_issues(jql_query)
 
             if issues:
                 for issue in issues:
-                    _logger.warning(f'{self.src.issue.key} already migrated as {issue.key}')
+                    _logger.warning(f'{self.key} already migrated as {issue.key}')
                     status = issue.key
                     break
             else:
@@ -202,23 +916,15 @@ class MIGRATE_ISSUE():
         status:bool = False
 
         rfe = self.src.issue.key
-        created = self.src.issue.fields.created
-        updated = self.src.issue.fields.updated
         if hasattr(self.src.issue.fields.reporter, 'displayName'):
-            reporter = self.src.issue.fields.reporter.displayName
             self.copy_reporter()
-        else:
-            reporter = ''
 
         # Update 'RFE #' custom field
         if self.dst.update_field(field=custom_field, value=rfe):
             _logger.info(f'Added RFE {rfe} to field {custom_field}')
         
-            # Build comment
-            comment = ( f'Origin: {rfe}, \nCreated by: {reporter}, '
-                        f'\nCreated: {created}, \nLast updated: {updated}' )
             # Add comment
-            if self.dst.add_comment(comment=comment):
+            if self.dst.add_comment(comment=self.origin_comment()):
                 status = True
             else:
                 _logger.error(f'Failed to add origin data')
@@ -231,6 +937,22 @@ class MIGRATE_ISSUE():
         return status
 
 
+    def origin_comment(self) -> str:
+        '''
+        Comment recording the original RFE, reporter and timestamps
+        '''
+        rfe = self.src.issue.key
+        created = self.src.issue.fields.created
+        updated = self.src.issue.fields.updated
+        if hasattr(self.src.issue.fields.reporter, 'displayName'):
+            reporter = self.src.issue.fields.reporter.displayName
+        else:
+            reporter = ''
+
+        return ( f'Origin: {rfe}, \nCreated by: {reporter}, '
+                 f'\nCreated: {created}, \nLast updated: {updated}' )
+
+
     def get_versions(self) -> list:
         '''
         Retrieve current versions or create a default response
@@ -242,8 +964,10 @@ class MIGRATE_ISSUE():
             if versions:
                 for version in versions:
                     if hasattr(version, 'name'):
-                        if self.check_version(version.name):
-                            src_versions.append({ 'name': version.name })
+                        name = self.context.version_map.get(version.name,
+                                                            version.name)
+                        if self.check_version(name):
+                            src_versions.append({ 'name': name })
                         else:
                             src_versions.append({ 'name': 'Unknown' })
                     else:
@@ -260,44 +984,23 @@ class MIGRATE_ISSUE():
 
     def check_version(self, version):
         '''
+        Check version is allowed in the destination project
         '''
-        allowed:bool = False
-        allowed_versions:list = self.get_allowed_versions()
-
-        if version in allowed_versions:
-            allowed = True
-        else:
-            allowed = False
-        
-        return allowed
+        return version in self.context.allowed_versions
 
 
     def get_allowed_versions(self):
         '''
+        Get the allowed version values
         '''
-        allowed_versions:list = []
-
-        versions:list = self.required_fields.get('versions').get('allowedValues')
-        for v in versions:
-            allowed_versions.append(v.get('name'))
-
-        return allowed_versions
+        return self.context.allowed_versions
     
 
     def get_allowed_components(self):
         '''
         Get the allowed component values 
         '''
-        allowed:list = []
-        fields = self.required_fields
-
-        if fields.get('components'):
-            values = fields.get('components').get('allowedValues')
-            if values:
-                for comp in values:
-                    allowed.append(comp.get('name'))
-
-        return allowed
+        return self.context.allowed_components
 
 
     def build_components(self) -> dict:
@@ -307,8 +1010,10 @@ class MIGRATE_ISSUE():
         components:list = []
 
         for component in self.src.issue.fields.components:
-            if component.name in self.allowed_components:
-                components.append({ 'name': component.name })
+            name = self.context.component_map.get(component.name,
+                                                  component.name)
+            if name in self.allowed_components:
+                components.append({ 'name': name })
         
         # Need a holding component if there are no matches, need to consider
         # translating some of the existing names
@@ -442,64 +1147,157 @@ class MIGRATE_ISSUE():
 
     def remap_field(self, field:str) -> str:
         '''
+        Remap field name or id to the source field id holding its value
         '''
-        mapped_field:str
-
-        alt_mappings:dict = {
-                             # 'Product': 'Product (migrated)',
-                             'Product Family': 'Product (migrated)',
-                             'Support Cases': 'Support Cases (migrated)',
-                             'Prospects/Customers': 'Prospects/Customers (migrated)'
-                            }
-
-        if 'customfield' in field:
-            newfield = alt_mappings.get(self.src.field_map.get(field))
-        else:
-            newfield = alt_mappings.get(field)
-
-        if newfield:
-            mapped_field = self.src.field_map.get(newfield)
-        else:
-            mapped_field = field
-        
-        return mapped_field
+        return self.context.field_remap.get(field, field)
 
 
     def remap_option(self, option):
         '''
         Remap option values or return unchanged
         '''
-        mappings:dict = {
-                            "ActiveTrust Cloud": "BloxOne TD"
-                            # "BloxOne DDI": "UDDI",
-                            # "BloxOne TD": "Infoblox Threat Defense",
-                            # "Network Insight": "NIOS"
-                        }
+        return self.context.option_map.get(option, option)
 
-        if option in mappings.keys():
-            remapped = mappings.get(option)
-        else:
-            remapped = option
 
-        return remapped
+    def copy_comments(self):
+        '''
+        Copy comments from source to destination, skipping those
+        already copied by an interrupted run
 
+        Returns:
+            bool indicating all comments were copied
+        '''
+        status:bool = False
 
-    def copy_comments(self):
+        if self.dst.issue:
+            status = True
+            # Jira stamps comments as they arrive, so posts for one issue
+            # stay sequential to keep the source order, while the next
+            # page of source comments is fetched in the background
+            try:
+                for comment in self.iter_source_comments():
+                    if comment['id'] in self.copied_comments:
+                        continue
+                    self.dst.jira_session.add_comment(self.dst.issue.key,
+                                                      comment['body'])
+                    self.copied_comments.add(comment['id'])
+                    self.journal_step('comment', id=comment['id'])
+            except jira.exceptions.JIRAError as err:
+                # Stop so that resumed copies keep the original order
+                _logger.error(f'Failed to copy comments for {self.key}: {err}')
+                status = False
+
+        return status
+
+
+    def iter_source_comments(self):
         '''
-        Copy comments from source to destination
+        Yield source comments formatted for the destination, streamed
+        page by page from the source unless already loaded
+
+        Yields:
+            dicts of id and body
         '''
-        if self.src.issue and self.dst.issue:
-            comments = self.src.get_comments()
-            # Add comments to the target issue
-            for comment in comments:
-                author = comment.author.displayName
-                body = ( f"Comment by {author} on "
-                         f"{comment.created}:\n\n{comment.body}" )
-                self.dst.jira_session.add_comment(self.dst.issue.key, body)
+        if self.comments is not None:
+            yield from self.comments
+            return
+
+        for comment in self.src.iter_comments(self.key):
+            author = comment.get('author', {}).get('displayName', 'Unknown')
+            body = ( f"Comment by {author} on "
+                     f"{comment.get('created')}:\n\n{comment.get('body')}" )
+            yield { 'id': comment['id'], 'body': body }
 
         return
 
 
+    def source_comments(self) -> list:
+        '''
+        All source comments formatted for the destination
+
+        Returns:
+            list of dicts of id and body
+        '''
+        if self.comments is None:
+            self.comments = list(self.iter_source_comments())
+
+        return self.comments
+
+
+    def source_attachments(self) -> list:
+        '''
+        Source attachment details
+
+        Returns:
+            list of dicts of id, filename, size, mimeType and content URL
+        '''
+        if self.attachments is None:
+            self.attachments = []
+            if self.src.issue:
+                for a in getattr(self.src.issue.fields, 'attachment', None) or []:
+                    self.attachments.append({ 'id': a.id,
+                                              'filename': a.filename,
+                                              'size': a.size,
+                                              'mimeType': getattr(a, 'mimeType',
+                                                                  'application/octet-stream'),
+                                              'content': a.content })
+
+        return self.attachments
+
+
+    def copy_attachment(self, attachment:dict) -> bool:
+        '''
+        Stream one attachment from source to destination, the download
+        is piped into the upload a chunk at a time so neither memory nor
+        disk holds the whole file
+        '''
+        status:bool = False
+
+        # Bound concurrent transfers across every issue in the run
+        with self.context.transfer_slots:
+            try:
+                response, chunks = self.src.download_attachment(attachment['content'])
+                try:
+                    self.dst.upload_attachment(chunks,
+                                               filename=attachment['filename'],
+                                               size=int(attachment['size']),
+                                               mime_type=attachment['mimeType'],
+                                               issue=self.dst.issue.key)
+                finally:
+                    response.close()
+                self.copied_attachments.add(attachment['id'])
+                self.journal_step('attachment', id=attachment['id'])
+                status = True
+            except (requests.exceptions.RequestException, ValueError) as err:
+                _logger.error(f'Failed to copy attachment {attachment["filename"]} ' +
+                              f'from {self.key}: {err}')
+                status = False
+
+        return status
+
+
+    def copy_attachments(self) -> bool:
+        '''
+        Copy the source attachments not already copied to destination
+
+        Returns:
+            bool indicating all attachments were copied
+        '''
+        status:bool = False
+
+        if self.dst.issue:
+            pending = [ a for a in self.source_attachments()
+                        if a['id'] not in self.copied_attachments ]
+            if len(pending) > 1:
+                with concurrent.futures.ThreadPoolExecutor(
+                        max_workers=self.context.transfers) as pool:
+                    status = all(list(pool.map(self.copy_attachment, pending)))
+            else:
+                status = all(self.copy_attachment(a) for a in pending)
+
+        return status
+
+
     def copy_reporter(self):
         '''
         Copy reporter from the src to dst
@@ -511,8 +1309,8 @@ class MIGRATE_ISSUE():
         if self.src.issue and self.dst.issue:
             accountId = self.src.get_reporter_id()
         else: 
-            issue = self.migrated()
-            if self.dst.get_issue(issue):
+            issue = self.migrated(project=self.dst_project)
+            if issue and self.dst.get_issue(issue):
                 accountId = self.src.get_reporter_id()
                 _logger.debug(f'Account ID: {accountId}')
             else:
@@ -520,7 +1318,7 @@ class MIGRATE_ISSUE():
                 _logger.debug(f'Issue {issue} not found.')
         
         if accountId:
-            status = self.dst.update_reporter(accountId)
+            status = self.dst.update_reporter(accountId=accountId)
             if status:
                 _logger.info('Successfully updated reporter')
             else:
@@ -532,6 +1330,365 @@ class MIGRATE_ISSUE():
         return status
     
 
+class MIGRATION_PLAN():
+    '''
+    Offline migration plan, source issues are read in batches and the
+    complete destination payloads are built and validated against the
+    cached destination schema before anything is written to Jira
+    '''
+
+    def __init__(self, context:MIGRATION_CONTEXT, filename:str):
+        '''
+        Initialise class
+
+        Parameters:
+            context: MIGRATION_CONTEXT = Shared run state
+            filename: str = JSONL plan file
+        '''
+        self.context = context
+        self.filename:str = filename
+
+        return
+
+
+    def build(self,
+              keys:list,
+              chunk_size:int = 100,
+              additional_fields:list = ['Support Cases',
+                                        'Prospects/Customers' ]) -> dict:
+        '''
+        Build the plan for keys, one JSONL entry per issue with a
+        status of planned, invalid, migrated or not found
+
+        Parameters:
+            keys: list = Source issue keys
+            chunk_size: int = Source issues retrieved per search
+
+        Returns:
+            dict of status: count
+        '''
+        counts:dict = collections.Counter()
+
+        with open(self.filename, 'w') as f:
+            for n in range(0, len(keys), chunk_size):
+                chunk = [ k.strip().upper() for k in keys[n:n + chunk_size] ]
+                found = self.context.jira_issues.get_issues(chunk, fields=['*all'])
+                for key in chunk:
+                    entry = self.plan_issue(key, found.get(key), additional_fields)
+                    counts[entry['status']] += 1
+                    f.write(json.dumps(entry, default=str) + '\n')
+                _logger.info(f'Planned {min(n + chunk_size, len(keys))} of {len(keys)}')
+
+        return dict(counts)
+
+
+    def plan_issue(self,
+                   key:str,
+                   source:object,
+                   additional_fields:list) -> dict:
+        '''
+        Plan entry for a single source issue
+        '''
+        entry:dict = { 'issue': key }
+
+        if not source:
+            entry['status'] = 'not found'
+            return entry
+
+        migrator = MIGRATE_ISSUE(issue=key, context=self.context, source=source)
+        if not migrator.plan(additional_fields=additional_fields):
+            entry.update({ 'status': 'migrated',
+                           'migrated_as': migrator.migrated_as })
+            return entry
+
+        try:
+            entry.update(migrator.plan_entry())
+        except jira.exceptions.JIRAError as err:
+            _logger.error(f'{key}: failed to read comments: {err}')
+            entry.update({ 'status': 'invalid', 'errors': [ str(err) ] })
+            return entry
+
+        errors = migrator.validate()
+        if errors:
+            _logger.error(f'{key}: {"; ".join(errors)}')
+            entry.update({ 'status': 'invalid', 'errors': errors })
+        else:
+            entry['status'] = 'planned'
+
+        return entry
+
+
+    def read(self, status:str = 'planned'):
+        '''
+        Stream plan entries with status
+
+        Returns:
+            generator of plan entry dicts
+        '''
+        with open(self.filename) as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry.get('status') == status:
+                    yield entry
+                else:
+                    _logger.info(f'Skipping {entry["issue"]}: {entry.get("status")}')
+
+        return
+
+
+class MIGRATION_PIPELINE():
+    '''
+    Bulk migration as a staged pipeline, fetch -> plan -> create -> enrich,
+    each stage with its own workers and a bounded queue in front of it so
+    slow stages overlap with the rest and memory stays bounded
+    '''
+
+    STAGES:tuple = ('fetch', 'plan', 'create', 'enrich')
+
+    def __init__(self,
+                 context:MIGRATION_CONTEXT,
+                 workers:dict = {},
+                 queue_size:int = 16,
+                 include_comments:bool = True,
+                 additional_fields:list = ['Support Cases',
+                                           'Prospects/Customers' ],
+                 journal:MIGRATION_JOURNAL = None,
+                 resume:bool = False,
+                 include_attachments:bool = True):
+        '''
+        Initialise class
+
+        Parameters:
+            context: MIGRATION_CONTEXT = Shared run state
+            workers: dict = Worker count per stage, default 1
+            queue_size: int = Maximum issues waiting in front of a stage
+            include_comments: bool = Copy source comments
+            include_attachments: bool = Copy source attachments
+            additional_fields: list = Additional field names to copy
+            journal: MIGRATION_JOURNAL = Journal of completed steps
+            resume: bool = Skip or continue issues found in the journal
+        '''
+        self.context = context
+        self.workers:dict = { stage: max(1, int(workers.get(stage, 1)))
+                              for stage in self.STAGES }
+        self.queue_size:int = queue_size
+        self.include_comments = include_comments
+        self.include_attachments = include_attachments
+        self.additional_fields = additional_fields
+        self.results:dict = {}
+        self._lock = threading.Lock()
+        # Source keys claimed by the create stage in this run
+        self.claimed:set = set()
+        self.journal = journal
+        self.state:dict = {}
+        if journal and resume:
+            self.state = journal.load()
+            _logger.info(f'Resuming with {len(self.state)} journalled issues')
+
+        # Every worker and attachment transfer shares the context session
+        self.context.jira_issues.set_pool_size(sum(self.workers.values()) +
+                                               self.context.transfers)
+
+        return
+
+
+    def record(self, issue:str, status:str):
+        '''
+        Record the final status of issue
+        '''
+        with self._lock:
+            self.results[issue] = status
+        _logger.info(status)
+
+        return
+
+
+    def fetch(self, item):
+        '''
+        Fetch stage, retrieve the source issue unless the journal or
+        index show it needs no further work, plan entries need no fetch
+        '''
+        migrator = None
+        planned = item if isinstance(item, dict) else None
+        issue = planned['issue'] if planned else item
+        state = self.state.get(issue)
+
+        if state and 'done' in state['steps']:
+            self.record(issue, f'{issue} previously migrated as: {state["created"]}')
+            return None
+        if not (state and state['created']) and self.context.index:
+            migrated_as = self.context.index.get(issue)
+            if migrated_as:
+                self.record(issue, f'{issue} previously migrated as: {migrated_as}')
+                return None
+
+        try:
+            migrator = MIGRATE_ISSUE(issue=issue,
+                                     context=self.context,
+                                     planned=planned)
+            migrator.journal = self.journal
+        except AssertionError:
+            self.record(issue, f'{issue} not found, aborting migration.')
+
+        return migrator
+
+
+    def plan(self, migrator:MIGRATE_ISSUE):
+        '''
+        Plan stage, check for previous migration and build the payload,
+        or pick up a partially enriched issue from the journal
+        '''
+        key = migrator.requested
+        state = self.state.get(key)
+
+        if state and state['created']:
+            if migrator.resume(state, additional_fields=self.additional_fields):
+                _logger.info(f'Resuming {key} as {state["created"]}')
+                return migrator
+            self.record(key, f'Error resuming {key} as {state["created"]}')
+            return None
+
+        if migrator.planned:
+            return migrator
+
+        if migrator.plan(additional_fields=self.additional_fields):
+            return migrator
+
+        self.record(key, f'{key} previously migrated as: {migrator.migrated_as}')
+
+        return None
+
+
+    def create(self, migrator:MIGRATE_ISSUE):
+        '''
+        Create stage, resumed issues already exist. The source key is
+        claimed and the index checked again under the lock, as another
+        create worker may have migrated it since the plan stage, and
+        planned entries are checked at execution time
+        '''
+        key = migrator.requested
+
+        if migrator.dst.issue:
+            return migrator
+
+        with self._lock:
+            claimed = migrator.key in self.claimed
+            self.claimed.add(migrator.key)
+        if claimed:
+            self.record(key, f'{key} is {migrator.key}, already migrated in this run')
+            return None
+        if migrator.planned:
+            # The plan may be stale, check the index swept for this run
+            # or search when it could not be swept
+            migrated_as = migrator.migrated(project=migrator.dst_project)
+        else:
+            migrated_as = self.context.index.get(migrator.key) if self.context.index else ''
+        if migrated_as:
+            self.record(key, f'{key} previously migrated as: {migrated_as}')
+            return None
+
+        if migrator.create():
+            return migrator
+
+        self.record(key, f'Error creating IFR from {key}')
+
+        return None
+
+
+    def enrich(self, migrator:MIGRATE_ISSUE):
+        '''
+        Enrich stage, follow up fields and comments
+        '''
+        status = f'{migrator.requested} submitted as: {migrator.dst.issue.key}'
+
+        if not migrator.enrich(include_comments=self.include_comments,
+                               include_attachments=self.include_attachments):
+            status = f'{status} (incomplete, use --resume to continue)'
+        self.record(migrator.requested, status)
+
+        return None
+
+
+    def run(self, items) -> list:
+        '''
+        Migrate issues through the pipeline
+
+        Parameters:
+            items: iterable = Source issue keys or MIGRATION_PLAN
+                              entries, consumed as the pipeline runs,
+                              repeated keys are migrated once
+
+        Returns:
+            list of status strings in input order, keyed by the
+            supplied issue keys
+        '''
+        keys:list = []
+        done = object()
+        queues:list = [ queue.Queue(maxsize=self.queue_size)
+                        for _ in self.STAGES ]
+        remaining:dict = dict(self.workers)
+        threads:list = []
+
+        def worker(n:int):
+            stage = self.STAGES[n]
+            func = getattr(self, stage)
+            while True:
+                item = queues[n].get()
+                if item is done:
+                    break
+                try:
+                    result = func(item)
+                except Exception as err:
+                    if isinstance(item, str):
+                        key = item
+                    elif isinstance(item, dict):
+                        key = item['issue']
+                    else:
+                        key = item.requested
+                    _logger.exception(f'{stage} failed for {key}')
+                    self.record(key, f'Error migrating {key}: {err}')
+                    result = None
+                if result is not None and n + 1 < len(self.STAGES):
+                    queues[n + 1].put(result)
+            # Last worker out closes the next stage
+            with self._lock:
+                remaining[stage] -= 1
+                last = remaining[stage] == 0
+            if last and n + 1 < len(self.STAGES):
+                for _ in range(self.workers[self.STAGES[n + 1]]):
+                    queues[n + 1].put(done)
+
+            return
+
+        for n, stage in enumerate(self.STAGES):
+            for i in range(self.workers[stage]):
+                t = threading.Thread(target=worker, args=(n,),
+                                     name=f'{stage}-{i}', daemon=True)
+                t.start()
+                threads.append(t)
+
+        seen:set = set()
+        for item in items:
+            if isinstance(item, dict):
+                key = item['issue'] = item['issue'].strip().upper()
+            else:
+                key = item = item.strip().upper()
+            keys.append(key)
+            if key in seen:
+                _logger.warning(f'{key} repeated, migrating once')
+                continue
+            seen.add(key)
+            queues[0].put(item)
+        for _ in range(self.workers['fetch']):
+            queues[0].put(done)
+
+        for t in threads:
+            t.join()
+
+        return [ self.results.get(key, f'{key} not processed')
+                 for key in keys ]
+
+
 ### Main ###
 if __name__ == '__main__':
     exitcode = main()
@@ -0,0 +1,600 @@
+#!/usr/bin/env python3
+#vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
+'''
+
+ Description:
+
+    Local SQLite mirror of Jira issues with incremental sync
+
+ Requirements:
+   Python 3.8+
+
+ Author: Chris Marrison
+
+ Date Last Updated: 20261017
+
+ Todo:
+
+ Copyright (c) 2026 Chris Marrison / Infoblox
+
+ Redistribution and use in source and binary forms,
+ with or without modification, are permitted provided
+ that the following conditions are met:
+
+ 1. Redistributions of source code must retain the above copyright
+ notice, this list of conditions and the following disclaimer.
+
+ 2. Redistributions in binary form must reproduce the above copyright
+ notice, this list of conditions and the following disclaimer in the
+ documentation and/or other materials provided with the distribution.
+
+ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+ FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+ COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+ INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+ BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+ LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+ CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+ LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+ ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+ POSSIBILITY OF SUCH DAMAGE.
+
+'''
+__version__ = '0.0.1'
+__author__ = 'Chris Marrison'
+__author_email__ = 'chris@infoblox.com'
+
+
+import logging
+import os
+import json
+import time
+import datetime
+import sqlite3
+import threading
+
+_logger = logging.getLogger(__name__)
+
+# Bump when the table layout changes, the mirror is then rebuilt
+MIRROR_VERSION:int = 4
+
+SCHEMA:list = [
+    '''CREATE TABLE IF NOT EXISTS meta (
+           name TEXT PRIMARY KEY,
+           value TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS issues (
+           key TEXT PRIMARY KEY,
+           id INTEGER,
+           project TEXT,
+           issuetype TEXT,
+           status TEXT,
+           summary TEXT,
+           reporter TEXT,
+           reporter_id TEXT,
+           assignee TEXT,
+           assignee_id TEXT,
+           created TEXT,      -- UTC, see utc_timestamp()
+           updated TEXT,
+           fetched REAL,
+           raw TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS issue_fields (
+           key TEXT,
+           field TEXT,
+           value TEXT,
+           PRIMARY KEY (key, field))''',
+    '''CREATE TABLE IF NOT EXISTS sync_state (
+           project TEXT PRIMARY KEY,
+           watermark TEXT,
+           synced REAL)''',
+    # Case insensitive indexes for the commonly filtered columns
+    'CREATE INDEX IF NOT EXISTS issues_project ON issues (project COLLATE NOCASE)',
+    'CREATE INDEX IF NOT EXISTS issues_status ON issues (status COLLATE NOCASE)',
+    'CREATE INDEX IF NOT EXISTS issues_reporter ON issues (reporter COLLATE NOCASE)',
+    'CREATE INDEX IF NOT EXISTS issues_assignee ON issues (assignee COLLATE NOCASE)',
+    'CREATE INDEX IF NOT EXISTS issues_created ON issues (created)',
+    'CREATE INDEX IF NOT EXISTS issues_updated ON issues (updated)',
+    'CREATE INDEX IF NOT EXISTS fields_value ON issue_fields (field, value COLLATE NOCASE)',
+]
+
+# Full text index, only created when SQLite is built with FTS5. Rows
+# share the rowid of the issue so replacing an entry is a rowid lookup,
+# the mirror is never VACUUMed so those rowids stay stable
+FTS_SCHEMA:str = '''CREATE VIRTUAL TABLE IF NOT EXISTS issues_fts USING fts5 (
+                        summary,
+                        description,
+                        comments,
+                        tokenize = 'porter unicode61')'''
+
+
+class MirrorServerError(Exception):
+    '''
+    Exception for a mirror database created for a different server
+    '''
+    pass
+
+
+def render_value(value) -> str:
+    '''
+    Convert a raw Jira field value to a flat string
+
+    Parameters:
+        value = Raw JSON field value
+
+    Returns:
+        str or None
+    '''
+    rendered = None
+
+    if isinstance(value, dict):
+        for attr in [ 'displayName', 'value', 'name', 'key' ]:
+            if attr in value:
+                rendered = str(value[attr])
+                break
+    elif isinstance(value, list):
+        rendered = ', '.join(filter(None, [ render_value(v) for v in value ]))
+    elif value is not None:
+        rendered = str(value)
+
+    return rendered
+
+
+def utc_timestamp(value:str) -> str:
+    '''
+    Jira timestamp, e.g. 2024-05-29T10:11:12.000-0700, as a UTC string
+    2024-05-29T17:11:12.000 so that stored dates compare as text
+    whatever the offset of the user who fetched them
+
+    Returns:
+        UTC timestamp or value unchanged if it cannot be parsed
+    '''
+    try:
+        date = datetime.datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%f%z')
+    except (TypeError, ValueError):
+        return value
+
+    date = date.astimezone(datetime.timezone.utc)
+
+    return date.strftime('%Y-%m-%dT%H:%M:%S.') + f'{date.microsecond // 1000:03d}'
+
+
+def project_key(value) -> str:
+    '''
+    Project key of a raw Jira project value, the key is what JQL and
+    sync use to refer to a project, unlike its display name
+
+    Parameters:
+        value = Raw JSON project value or project resource
+
+    Returns:
+        Upper case project key or None
+    '''
+    key = None
+
+    if isinstance(value, dict):
+        key = value.get('key')
+    elif value is not None:
+        key = getattr(value, 'key', value)
+
+    return str(key).upper() if key else None
+
+
+class ISSUE_MIRROR():
+    '''
+    SQLite store of issues (raw JSON plus indexed columns) for chosen
+    projects, kept current with an "updated >= watermark" JQL sync
+
+    Deleted issues are not detected by an incremental sync, use
+    sync(full=True) to rebuild a project.
+    '''
+
+    def __init__(self, filename:str, server:str):
+        '''
+        Initial Values
+
+        Parameters:
+            filename:str = SQLite database file
+            server:str = Jira server URL the mirror belongs to
+        '''
+        self.filename:str = os.path.abspath(os.path.expanduser(filename))
+        self.server:str = server.rstrip('/')
+        self._lock = threading.RLock()
+        self.fts:bool = False
+
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        self.db = sqlite3.connect(self.filename, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.create_tables()
+
+        return
+
+
+    def create_tables(self):
+        '''
+        Create tables, rebuilding the mirror if its version differs
+
+        Raises:
+            MirrorServerError
+        '''
+        with self._lock, self.db:
+            for statement in SCHEMA:
+                self.db.execute(statement)
+            meta = dict(self.db.execute('SELECT name, value FROM meta'))
+
+            if meta.get('server', self.server) != self.server:
+                raise MirrorServerError(f'{self.filename} mirrors ' +
+                                        f'{meta.get("server")} not {self.server}')
+            if meta.get('version') not in [ None, str(MIRROR_VERSION) ]:
+                _logger.warning(f'Mirror version changed, rebuilding {self.filename}')
+                for table in [ 'issues', 'issue_fields', 'sync_state' ]:
+                    self.db.execute(f'DELETE FROM {table}')
+                self.db.execute('DROP TABLE IF EXISTS issues_fts')
+
+            self.db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                            ('server', self.server))
+            self.db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                            ('version', str(MIRROR_VERSION)))
+
+        self.create_fts()
+
+        return
+
+
+    def create_fts(self):
+        '''
+        Create the full text index, populating it from existing issues
+        if it is new
+        '''
+        try:
+            with self._lock, self.db:
+                self.db.execute(FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError as err:
+            _logger.warning(f'Full text search unavailable: {err}')
+            self.fts = False
+
+        if self.fts:
+            with self._lock:
+                indexed = self.db.execute('SELECT COUNT(*) FROM issues_fts').fetchone()[0]
+                rows = []
+                if not indexed:
+                    rows = self.db.execute('SELECT rowid, raw FROM issues').fetchall()
+            if rows:
+                _logger.info(f'Building full text index for {len(rows)} issues')
+                with self._lock, self.db:
+                    for row in rows:
+                        self.index_text(json.loads(row['raw']), row['rowid'])
+
+        return
+
+
+    def index_text(self, raw:dict, rowid:int):
+        '''
+        Add the full text index entry for an issue stored at rowid, the
+        caller holds the lock and transaction
+        '''
+        fields:dict = raw.get('fields', {})
+        comments = (fields.get('comment') or {}).get('comments', [])
+
+        self.db.execute('INSERT INTO issues_fts (rowid, summary, description, comments) ' +
+                        'VALUES (?, ?, ?, ?)',
+                        ( rowid,
+                          fields.get('summary') or '',
+                          fields.get('description') or '',
+                          '\n'.join(c.get('body') or '' for c in comments) ))
+
+        return
+
+
+    def store(self, raw:dict, field_ids:dict = {}):
+        '''
+        Insert or update an issue
+
+        Parameters:
+            raw:dict = Raw issue JSON as returned by Jira (issue.raw)
+            field_ids:dict = Field names to field ids of additional
+                             fields to index, e.g. the summary fields
+        '''
+        fields:dict = raw.get('fields', {})
+        reporter = fields.get('reporter') or {}
+        assignee = fields.get('assignee') or {}
+
+        row = ( raw.get('key'),
+                int(raw.get('id', 0)),
+                project_key(fields.get('project')),
+                render_value(fields.get('issuetype')),
+                render_value(fields.get('status')),
+                fields.get('summary'),
+                reporter.get('displayName'),
+                reporter.get('accountId'),
+                assignee.get('displayName'),
+                assignee.get('accountId'),
+                utc_timestamp(fields.get('created')),
+                utc_timestamp(fields.get('updated')),
+                time.time(),
+                json.dumps(raw) )
+
+        with self._lock, self.db:
+            if self.fts:
+                # REPLACE gives the issue a new rowid, drop the old entry
+                old = self.db.execute('SELECT rowid FROM issues WHERE key = ?',
+                                      (raw.get('key'),)).fetchone()
+                if old:
+                    self.db.execute('DELETE FROM issues_fts WHERE rowid = ?',
+                                    (old[0],))
+            cursor = self.db.execute('INSERT OR REPLACE INTO issues VALUES ' +
+                                     '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', row)
+            if self.fts:
+                self.index_text(raw, cursor.lastrowid)
+            for name, id in field_ids.items():
+                if id in fields:
+                    self.db.execute('INSERT OR REPLACE INTO issue_fields ' +
+                                    'VALUES (?, ?, ?)',
+                                    (raw.get('key'), name,
+                                     render_value(fields.get(id))))
+
+        return
+
+
+    def get(self, key:str, max_age:int = 0) -> dict:
+        '''
+        Retrieve an issue from the mirror
+
+        Parameters:
+            key:str = Issue key
+            max_age:int = Maximum age in seconds since the issue was
+                          stored or its project synced, 0 for any age
+
+        Returns:
+            Raw issue JSON or None
+        '''
+        raw:dict = None
+
+        with self._lock:
+            row = self.db.execute('''SELECT issues.raw,
+                                        MAX(issues.fetched,
+                                            IFNULL(sync_state.synced, 0)) AS age
+                                     FROM issues LEFT JOIN sync_state
+                                        ON issues.project = sync_state.project
+                                     WHERE issues.key = ?''',
+                                  (key.upper(),)).fetchone()
+
+        if row:
+            if max_age and time.time() - row['age'] > max_age:
+                _logger.debug(f'Mirrored copy of {key} is too old')
+            else:
+                raw = json.loads(row['raw'])
+
+        return raw
+
+
+    def project_issues(self, project:str, max_age:int = 0) -> list:
+        '''
+        Retrieve all mirrored issues for a synced project
+
+        Parameters:
+            project:str = Project key
+            max_age:int = Maximum age in seconds of the last sync,
+                          0 for any age
+
+        Returns:
+            list of raw issue JSON or None if the project is not
+            synced recently enough
+        '''
+        issues:list = None
+
+        if self.synced(project, max_age=max_age):
+            with self._lock:
+                rows = self.db.execute('SELECT raw FROM issues ' +
+                                       'WHERE project = ? ORDER BY id DESC',
+                                       (project.upper(),)).fetchall()
+            issues = [ json.loads(row['raw']) for row in rows ]
+
+        return issues
+
+
+    def select(self,
+               where:str,
+               params:list,
+               order:str,
+               max_age:int = 0) -> list:
+        '''
+        Select mirrored issues with a SQL condition, as produced by
+        jql_local.translate()
+
+        Parameters:
+            max_age:int = Only include issues stored, or whose project
+                          was synced, within max_age seconds
+
+        Returns:
+            list of raw issue JSON
+        '''
+        if max_age:
+            where = (f'({where}) AND MAX(fetched, IFNULL((SELECT synced ' +
+                     'FROM sync_state s WHERE s.project = issues.project), 0)) >= ?')
+            params = list(params) + [ time.time() - max_age ]
+
+        with self._lock:
+            rows = self.db.execute(f'SELECT raw FROM issues WHERE {where} ' +
+                                   f'ORDER BY {order}', params).fetchall()
+
+        return [ json.loads(row['raw']) for row in rows ]
+
+
+    def search(self, text:str, limit:int = 20) -> list:
+        '''
+        Full text search of summaries, descriptions and comments
+
+        Parameters:
+            text:str = Words to search for, all must match
+            limit:int = Maximum number of results
+
+        Returns:
+            list of dict with key, summary and score, best match first
+        '''
+        results:list = []
+        words = text.split()
+
+        if not words:
+            return results
+
+        with self._lock:
+            if self.fts:
+                # Quote each word so user input is never FTS syntax
+                match = ' '.join('"' + w.replace('"', '""') + '"' for w in words)
+                rows = self.db.execute('''SELECT issues.key AS key,
+                                              issues.summary AS summary,
+                                              bm25(issues_fts) AS score
+                                          FROM issues_fts JOIN issues
+                                              ON issues.rowid = issues_fts.rowid
+                                          WHERE issues_fts MATCH ?
+                                          ORDER BY score LIMIT ?''',
+                                       (match, limit)).fetchall()
+            else:
+                # Unranked fallback without FTS5
+                where = ' AND '.join([ 'raw LIKE ?' ] * len(words))
+                rows = self.db.execute(f'''SELECT key, summary, 0 AS score
+                                           FROM issues WHERE {where}
+                                           ORDER BY id DESC LIMIT ?''',
+                                       [ f'%{w}%' for w in words ] + [ limit ]).fetchall()
+
+        results = [ dict(row) for row in rows ]
+
+        return results
+
+
+    def sync_state(self, project:str) -> dict:
+        '''
+        Get watermark and last sync time for project
+
+        Returns:
+            dict or None if the project has never been synced
+        '''
+        with self._lock:
+            row = self.db.execute('SELECT * FROM sync_state WHERE project = ?',
+                                  (project.upper(),)).fetchone()
+
+        return dict(row) if row else None
+
+
+    def synced(self, project:str, max_age:int = 0) -> bool:
+        '''
+        Check project has been synced, and so holds every issue of the
+        project as of its last sync, within max_age seconds
+
+        Parameters:
+            project:str = Project key
+            max_age:int = Maximum age in seconds of the last sync,
+                          0 for any age
+
+        Returns:
+            bool
+        '''
+        state = self.sync_state(project)
+
+        return bool(state and (not max_age or
+                               time.time() - state['synced'] <= max_age))
+
+
+    def sync(self, jira_issues, project:str, full:bool = False) -> int:
+        '''
+        Incrementally sync project from Jira, fetching only the issues
+        updated since the previous sync
+
+        Parameters:
+            jira_issues:issues.ISSUES = ISSUES object used for queries
+            project:str = Project key
+            full:bool = Ignore the watermark and fetch every issue
+
+        Returns:
+            Number of issues stored
+        '''
+        count:int = 0
+        project = project.upper()
+        state = self.sync_state(project)
+        watermark = state.get('watermark') if state and not full else None
+        latest = watermark
+        started = time.time()
+        field_ids = jira_issues.mirror_field_ids()
+
+        query = f'project = "{project}"'
+        if watermark:
+            query += f' AND updated >= "{self.jql_date(watermark)}"'
+        query += ' ORDER BY updated ASC'
+        _logger.info(f'Syncing {project}: {query}')
+
+        if full:
+            # The project counts as unsynced until the fetch completes,
+            # so a failed rebuild is never answered from locally
+            with self._lock, self.db:
+                self.db.execute('DELETE FROM sync_state WHERE project = ?',
+                                (project,))
+                self.db.execute('DELETE FROM issue_fields WHERE key IN ' +
+                                '(SELECT key FROM issues WHERE project = ?)',
+                                (project,))
+                if self.fts:
+                    self.db.execute('DELETE FROM issues_fts WHERE rowid IN ' +
+                                    '(SELECT rowid FROM issues WHERE project = ?)',
+                                    (project,))
+                self.db.execute('DELETE FROM issues WHERE project = ?',
+                                (project,))
+
+        # All fields, so comments are available to the full text index
+        for issue in jira_issues.iter_jql(query, fields=[ '*all' ]):
+            self.store(issue.raw, field_ids=field_ids)
+            updated = issue.raw.get('fields', {}).get('updated')
+            if updated and (not latest or self.parse_date(updated) >
+                                           self.parse_date(latest)):
+                latest = updated
+            count += 1
+
+        with self._lock, self.db:
+            self.db.execute('INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)',
+                            (project, latest, started))
+        _logger.info(f'Synced {count} issues for {project}')
+
+        return count
+
+
+    def parse_date(self, value:str) -> datetime.datetime:
+        '''
+        Parse a Jira timestamp e.g. 2024-05-29T10:11:12.000+0000
+        '''
+        return datetime.datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%f%z')
+
+
+    def jql_date(self, value:str) -> str:
+        '''
+        Convert a Jira timestamp to a JQL date for the sync query.
+
+        JQL dates have minute resolution and use the user's time zone,
+        so step back a day; re-fetching a few issues is harmless as
+        stores are idempotent.
+        '''
+        date = self.parse_date(value).astimezone(datetime.timezone.utc)
+        date -= datetime.timedelta(days=1)
+
+        return date.strftime('%Y/%m/%d %H:%M')
+
+
+    def stats(self) -> dict:
+        '''
+        Mirror statistics
+
+        Returns:
+            dict of issue counts and sync state per project
+        '''
+        stats:dict = {}
+
+        with self._lock:
+            for row in self.db.execute('''SELECT issues.project AS project,
+                                              COUNT(*) AS issues,
+                                              sync_state.synced AS synced
+                                          FROM issues LEFT JOIN sync_state
+                                              ON issues.project = sync_state.project
+                                          GROUP BY issues.project'''):
+                stats[row['project']] = { 'issues': row['issues'],
+                                          'synced': row['synced'] }
+
+        return stats
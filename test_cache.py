@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+#vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
+'''
+Tests for the on-disk caches
+'''
+import cache
+
+
+SERVER = 'https://example.atlassian.net'
+
+
+def test_disk_cache_per_user(tmp_path):
+    c = cache.DISK_CACHE('fields', cache_dir=str(tmp_path))
+    c.put(SERVER, [ { 'id': 'customfield_1' } ], 'a@example.com')
+
+    assert c.get(SERVER + '/', 'a@example.com') == [ { 'id': 'customfield_1' } ]
+    assert c.get(SERVER, 'b@example.com') is None
+    assert c.filename(SERVER, 'a@example.com') != c.filename(SERVER, 'b@example.com')
+
+
+def test_disk_cache_entries_per_user(tmp_path):
+    c = cache.DISK_CACHE('schemas', cache_dir=str(tmp_path))
+    c.put_entry(SERVER, 'IFR/New Feature', { 'summary': {} }, user='a@example.com')
+
+    assert c.get_entry(SERVER, 'IFR/New Feature', user='a@example.com') == { 'summary': {} }
+    assert c.get_entry(SERVER, 'IFR/New Feature', user='b@example.com') is None
+    assert c.invalidate(SERVER, 'a@example.com')
+    assert c.get_entry(SERVER, 'IFR/New Feature', user='a@example.com') is None
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+#vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
+'''
+Tests for batched and paged issue retrieval
+'''
+import types
+import pytest
+
+jira = pytest.importorskip('jira')
+pytest.importorskip('rich')
+
+import issues
+
+
+def fake_issue(key:str, id:str = '10001'):
+    return types.SimpleNamespace(key=key, id=id, raw={ 'key': key, 'id': id })
+
+
+class FAKE_JIRA():
+    '''
+    search_issues() and issue() over a fixed set of issues, old keys of
+    moved issues resolve to the current issue as on Jira
+    '''
+
+    def __init__(self, current:list, moved:dict = {}):
+        self.current:dict = { i.key: i for i in current }
+        self.moved:dict = moved
+        self.queries:list = []
+
+
+    def search_issues(self, jql:str, **kwargs):
+        self.queries.append(jql)
+        keys = [ k.strip(' "') for k in jql[len('key in ('):-1].split(',') ]
+        return [ self.issue(k) for k in keys
+                 if k in self.current or k in self.moved ]
+
+
+    def issue(self, key:str, fields:str = None):
+        key = self.moved.get(key, key)
+        if key not in self.current:
+            raise jira.exceptions.JIRAError(status_code=404, text='Issue does not exist')
+        return self.current[key]
+
+
+def session(jira_session):
+    i = issues.ISSUES.__new__(issues.ISSUES)
+    i.jira_session = jira_session
+    return i
+
+
+def test_get_issues_by_requested_key():
+    fake = FAKE_JIRA([ fake_issue('IFR-1'), fake_issue('IFR-7') ],
+                     moved={ 'RFE-3': 'IFR-7' })
+    found = session(fake).get_issues([ 'ifr-1', 'RFE-3', 'IFR-2', 'IFR-1' ])
+
+    assert found == { 'IFR-1': fake.current['IFR-1'],
+                      'RFE-3': fake.current['IFR-7'] }
+    assert fake.queries == [ 'key in ("IFR-1", "RFE-3", "IFR-2")' ]
+
+
+class PAGES():
+    '''
+    search_issues() returning one project's issues after the key bound
+    in the query, at most maxResults and never more than cap per page
+    '''
+
+    def __init__(self, count:int, cap:int = 1000):
+        self.issues:list = [ fake_issue(f'IFR-{n}', str(20000 - n))
+                             for n in range(1, count + 1) ]
+        self.cap:int = cap
+        self.queries:list = []
+
+
+    def search_issues(self, jql:str, startAt:int = 0, maxResults:int = 50, **kwargs):
+        self.queries.append(jql)
+        remaining = self.issues
+        if 'key > ' in jql:
+            after = int(jql.split('key > "IFR-')[1].split('"')[0])
+            remaining = [ i for i in self.issues if int(i.key[4:]) > after ]
+        page = jira.client.ResultList(remaining[startAt:startAt + min(maxResults, self.cap)],
+                                      _startAt=startAt,
+                                      _total=len(remaining) - startAt)
+        return page
+
+
+def test_iter_jql_keyset_pages_by_key():
+    fake = PAGES(5, cap=2)
+    found = list(session(fake).iter_jql('project = IFR ORDER BY created DESC',
+                                        page_size=3, fields=[ 'summary' ],
+                                        keyset=True))
+
+    assert [ i.key for i in found ] == [ f'IFR-{n}' for n in range(1, 6) ]
+    assert fake.queries == [ 'project = IFR ORDER BY key ASC',
+                             '(project = IFR) AND key > "IFR-2" ORDER BY key ASC',
+                             '(project = IFR) AND key > "IFR-4" ORDER BY key ASC' ]
+
+
+def test_iter_jql_keyset_stops_on_last_page():
+    fake = PAGES(4)
+    found = list(session(fake).iter_jql('project = IFR', page_size=2,
+                                        fields=[ 'summary' ], keyset=True))
+
+    assert len(found) == 4
+    assert len(fake.queries) == 2
+
+
+def test_iter_jql_keyset_needs_single_project():
+    fake = PAGES(3)
+    found = list(session(fake).iter_jql('project in (IFR, RFE)', page_size=2,
+                                        fields=[ 'summary' ], keyset=True))
+
+    assert len(found) == 3
+    assert fake.queries == [ 'project in (IFR, RFE)' ] * 2
+
+
+def test_clone_shares_field_indexes():
+    i = session(None)
+    i.issue = fake_issue('IFR-1')
+    i.transitions = [ { 'id': '11' } ]
+    i.transitions_cached = True
+    i.field_map = { 'Summary': 'summary', 'summary': 'Summary' }
+    i.field_ids = { 'summary': { 'id': 'summary', 'name': 'Summary' } }
+    i.field_names = { 'summary': [ i.field_ids['summary'] ] }
+    i.fields = list(i.field_ids.values())
+    i.summary_fields = [ 'Summary' ]
+
+    c = i.clone()
+
+    assert c.field_map is i.field_map
+    assert c.field_ids is i.field_ids
+    assert c.field_names is i.field_names
+    assert c.jira_session is i.jira_session
+    assert c.issue is None and c.transitions == [] and not c.transitions_cached
+    assert i.issue.key == 'IFR-1' and i.transitions_cached
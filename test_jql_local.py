@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+#vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
+'''
+Tests for the local JQL subset
+'''
+import time
+import jql_local
+import mirror
+from test_mirror import SERVER, raw_issue
+
+
+def projects(query:str):
+    translator = jql_local.JQL_TRANSLATOR()
+    translator.translate(query)
+    return translator.projects
+
+
+def test_project_scope():
+    assert projects('project = ifr') == { 'IFR' }
+    assert projects("status = 'open' and project = ifr ORDER BY created DESC") == { 'IFR' }
+    assert projects('project in (IFR, RFE) and project = rfe') == { 'RFE' }
+    assert projects('project = IFR or project = RFE') == { 'IFR', 'RFE' }
+    assert projects('project = IFR or status = Open') is None
+    assert projects('not project = IFR') is None
+    assert projects('project != IFR') is None
+    assert projects('status = Open') is None
+
+
+def test_project_clause_matches_mirror(tmp_path):
+    m = mirror.ISSUE_MIRROR(str(tmp_path / 'mirror.db'), SERVER)
+    m.store(raw_issue())
+    with m.db:
+        m.db.execute('INSERT INTO sync_state VALUES (?, ?, ?)',
+                     ('IFR', None, time.time()))
+
+    query = "status = 'open' and project = ifr ORDER BY created DESC"
+    where, params, order = jql_local.translate(query)
+    assert [ r['key'] for r in m.select(where, params, order, max_age=3600) ] == [ 'IFR-1' ]
+    assert m.synced('IFR', max_age=3600)
+    assert not m.synced('RFE')
+
+
+def test_dates_compare_in_utc(tmp_path, monkeypatch):
+    monkeypatch.setenv('TZ', 'America/Los_Angeles')
+    time.tzset()
+    try:
+        m = mirror.ISSUE_MIRROR(str(tmp_path / 'mirror.db'), SERVER)
+        raw = raw_issue()
+        # 2024-05-30T06:30 UTC, late on the 29th in the user's time zone
+        raw['fields']['created'] = '2024-05-29T23:30:00.000-0700'
+        m.store(raw)
+        recent = raw_issue('IFR-2', '10002')
+        two_hours_ago = time.time() - 7200
+        recent['fields']['created'] = time.strftime('%Y-%m-%dT%H:%M:%S.000+0000',
+                                                    time.gmtime(two_hours_ago))
+        m.store(recent)
+
+        def keys(query:str) -> list:
+            where, params, order = jql_local.translate(query + ' ORDER BY key')
+            return [ r['key'] for r in m.select(where, params, order) ]
+
+        assert keys('created >= "2024/05/29 23:00"') == [ 'IFR-1', 'IFR-2' ]
+        assert keys('created < "2024/05/29 23:00"') == []
+        assert keys('created = "2024-05-29"') == [ 'IFR-1' ]
+        assert keys('created >= -3h') == [ 'IFR-2' ]
+        assert keys('created >= -1h') == []
+    finally:
+        monkeypatch.delenv('TZ')
+        time.tzset()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+#vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
+'''
+Tests for streamed attachment copies during migration
+'''
+import json
+import threading
+import types
+import pytest
+
+requests = pytest.importorskip('requests')
+pytest.importorskip('jira')
+pytest.importorskip('rich')
+
+import issues
+import migration
+
+
+ATTACHMENT = { 'id': '20001',
+               'filename': 'capture.pcap',
+               'size': '10',
+               'mimeType': 'application/octet-stream',
+               'content': 'https://example.atlassian.net/attachment/20001' }
+
+
+class UPLOAD_ADAPTER(requests.adapters.BaseAdapter):
+    '''
+    Transport reading the streamed request body as a server would
+    '''
+
+    def __init__(self, status:int = 200):
+        super().__init__()
+        self.status:int = status
+        self.received:bytes = b''
+
+
+    def send(self, request, **kwargs):
+        self.received = b''.join(iter(lambda: request.body.read(4), b''))
+        response = requests.Response()
+        response.status_code = self.status
+        response._content = json.dumps([ { 'id': '30001' } ]).encode()
+        response.request = request
+        response.url = request.url
+
+        return response
+
+
+    def close(self):
+        return
+
+
+def migrator(chunks:list, adapter:UPLOAD_ADAPTER):
+    '''
+    MIGRATE_ISSUE copying from a download of chunks to a session
+    served by adapter
+    '''
+    session = requests.Session()
+    session.mount('https://', adapter)
+    m = migration.MIGRATE_ISSUE.__new__(migration.MIGRATE_ISSUE)
+    m.context = types.SimpleNamespace(transfer_slots=threading.BoundedSemaphore(1))
+    m.key = m.requested = 'RFE-1'
+    m.journal = None
+    m.copied_attachments = set()
+    m.src = types.SimpleNamespace(
+        download_attachment=lambda url: (types.SimpleNamespace(close=lambda: None),
+                                         iter(chunks)))
+    m.dst = issues.ISSUES.__new__(issues.ISSUES)
+    m.dst.issue = types.SimpleNamespace(key='IFR-1')
+    m.dst.jira_session = types.SimpleNamespace(
+        _session=session,
+        _get_url=lambda path: f'https://example.atlassian.net/rest/api/2/{path}')
+
+    return m
+
+
+def test_copy_attachment():
+    adapter = UPLOAD_ADAPTER()
+    m = migrator([ b'01234', b'56789' ], adapter)
+
+    assert m.copy_attachment(ATTACHMENT)
+    assert b'\r\n\r\n0123456789\r\n--' in adapter.received
+    assert m.copied_attachments == { '20001' }
+
+
+def test_truncated_download_fails_copy():
+    m = migrator([ b'01234' ], UPLOAD_ADAPTER())
+
+    assert m.copy_attachment(ATTACHMENT) is False
+    assert not m.copied_attachments
+
+
+def test_rejected_upload_fails_copy():
+    m = migrator([ b'01234', b'56789' ], UPLOAD_ADAPTER(status=413))
+
+    assert m.copy_attachment(ATTACHMENT) is False
+    assert not m.copied_attachments
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+#vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
+'''
+Tests for the local issue mirror
+'''
+import time
+import mirror
+
+
+SERVER = 'https://example.atlassian.net'
+
+
+def raw_issue(key:str = 'IFR-1', id:str = '10001') -> dict:
+    '''
+    Raw issue JSON as returned by Jira
+    '''
+    return { 'key': key,
+             'id': id,
+             'fields': {
+                'project': { 'id': '10400',
+                             'key': 'IFR',
+                             'name': 'Infoblox Feature Requests' },
+                'issuetype': { 'id': '3', 'name': 'New Feature' },
+                'status': { 'id': '1', 'name': 'Open' },
+                'summary': 'Support DNS over QUIC',
+                'description': 'Please add DoQ',
+                'reporter': { 'displayName': 'A User', 'accountId': 'abc' },
+                'created': '2024-05-29T10:11:12.000+0000',
+                'updated': '2024-05-30T10:11:12.000+0000' } }
+
+
+def test_store_indexes_project_by_key(tmp_path):
+    m = mirror.ISSUE_MIRROR(str(tmp_path / 'mirror.db'), SERVER)
+    m.store(raw_issue())
+    with m.db:
+        m.db.execute('INSERT INTO sync_state VALUES (?, ?, ?)',
+                     ('IFR', None, 9999999999))
+
+    issues = m.project_issues('IFR', max_age=3600)
+    assert [ i['key'] for i in issues ] == [ 'IFR-1' ]
+    assert m.get('IFR-1', max_age=3600)['key'] == 'IFR-1'
+    assert list(m.stats()) == [ 'IFR' ]
+
+
+def test_project_key():
+    assert mirror.project_key({ 'key': 'ifr', 'name': 'Feature Requests' }) == 'IFR'
+    assert mirror.project_key(None) is None
+
+
+def test_search_after_restore(tmp_path):
+    m = mirror.ISSUE_MIRROR(str(tmp_path / 'mirror.db'), SERVER)
+    if not m.fts:
+        return
+    m.store(raw_issue())
+    m.store(raw_issue('IFR-2', '10002'))
+    raw = raw_issue()
+    raw['fields']['summary'] = 'Firewall logging'
+    m.store(raw)
+
+    assert [ r['key'] for r in m.search('firewall') ] == [ 'IFR-1' ]
+    assert [ r['key'] for r in m.search('quic') ] == [ 'IFR-2' ]
+    assert m.db.execute('SELECT COUNT(*) FROM issues_fts').fetchone()[0] == 2
+
+
+class FAILING_SYNC():
+    '''
+    ISSUES stand in whose query fails after the first issue
+    '''
+
+    def mirror_field_ids(self) -> dict:
+        return {}
+
+
+    def iter_jql(self, query:str, fields:list = None):
+        yield type('ISSUE', (), { 'raw': raw_issue('IFR-2', '10002') })
+        raise RuntimeError('Connection lost')
+
+
+def test_failed_full_sync_is_not_synced(tmp_path):
+    m = mirror.ISSUE_MIRROR(str(tmp_path / 'mirror.db'), SERVER)
+    m.store(raw_issue())
+    with m.db:
+        m.db.execute('INSERT INTO sync_state VALUES (?, ?, ?)',
+                     ('IFR', None, time.time()))
+    assert m.synced('IFR', max_age=3600)
+
+    try:
+        m.sync(FAILING_SYNC(), 'IFR', full=True)
+    except RuntimeError:
+        pass
+
+    assert not m.synced('IFR')